@@ -12,48 +12,51 @@ from pathlib import Path
 # 添加项目路径
 sys.path.append(str(Path(__file__).parent.parent))
 
-from src.simulation.environment import SimulationEnvironment
+from src.simulation.environment import SimulationEnvironment, RatePacer
 from src.utils.metrics import StabilityMetrics
 from src.utils.visualization import Plotter
 
 
-def example_1_basic_simulation():
-    """示例1: 基础仿真"""
-    print("\n" + "="*60)
-    print("示例1: 基础仿真")
-    print("="*60)
-    
-    # 获取路径
+def make_env() -> SimulationEnvironment:
+    """创建仿真环境并加载机器人"""
     base_path = Path(__file__).parent.parent
     config_path = base_path / 'config' / 'robot_config.yaml'
     urdf_path = base_path / 'models' / 'humanoid_v1.urdf'
     
-    # 创建环境
     env = SimulationEnvironment(str(config_path), gui=True)
     env.setup_world()
     env.load_robot(str(urdf_path))
+    return env
+
+
+def example_1_basic_simulation(env: SimulationEnvironment = None):
+    """示例1: 基础仿真"""
+    print("\n" + "="*60)
+    print("示例1: 基础仿真")
+    print("="*60)
+    
+    own_env = env is None
+    if own_env:
+        env = make_env()
     
     # 运行2秒仿真
     print("\n运行2秒仿真...")
     env.run(duration=2.0, real_time=True)
     
-    env.close()
+    if own_env:
+        env.close()
     print("✅ 示例1完成\n")
 
 
-def example_2_joint_control():
+def example_2_joint_control(env: SimulationEnvironment = None):
     """示例2: 关节控制"""
     print("\n" + "="*60)
     print("示例2: 关节控制")
     print("="*60)
     
-    base_path = Path(__file__).parent.parent
-    config_path = base_path / 'config' / 'robot_config.yaml'
-    urdf_path = base_path / 'models' / 'humanoid_v1.urdf'
-    
-    env = SimulationEnvironment(str(config_path), gui=True)
-    env.setup_world()
-    env.load_robot(str(urdf_path))
+    own_env = env is None
+    if own_env:
+        env = make_env()
     
     print("\n执行关节动作序列...")
     
@@ -73,88 +76,93 @@ def example_2_joint_control():
     
     for action in actions:
         print(f"\n▶ {action['name']}")
-        env.set_joint_positions(action['angles'])
         
-        # 执行1秒
-        for _ in range(1000):
-            env.step()
-            time.sleep(0.001)
+        # 执行1秒（1000步 @ 1ms），目标只需下发一次
+        env.run_steps(1000, action['angles'])
+        
+        # 停留1秒便于在GUI中观察
+        time.sleep(1.0)
     
-    env.close()
+    if own_env:
+        env.close()
     print("\n✅ 示例2完成\n")
 
 
-def example_3_state_monitoring():
+def example_3_state_monitoring(env: SimulationEnvironment = None):
     """示例3: 状态监测"""
     print("\n" + "="*60)
     print("示例3: 状态监测")
     print("="*60)
     
-    base_path = Path(__file__).parent.parent
-    config_path = base_path / 'config' / 'robot_config.yaml'
-    urdf_path = base_path / 'models' / 'humanoid_v1.urdf'
-    
-    env = SimulationEnvironment(str(config_path), gui=True)
-    env.setup_world()
-    env.load_robot(str(urdf_path))
+    own_env = env is None
+    if own_env:
+        env = make_env()
     
     print("\n监测2秒机器人状态...")
     
-    for i in range(200):  # 2秒 @ 100Hz
+    for i in range(0, 200, 50):  # 2秒 @ 100Hz, 每0.5秒打印一次
         env.step()
         
-        # 每0.5秒打印一次
-        if i % 50 == 0:
-            # 获取基座状态
-            base_state = env.get_base_state()
-            pos = base_state['position']
-            euler = base_state['orientation_euler']
-            
-            # 获取IMU数据
-            imu = env.get_imu_data()
-            
-            print(f"\nt={i*0.01:.2f}s:")
-            print(f"  位置: [{pos[0]:.3f}, {pos[1]:.3f}, {pos[2]:.3f}]")
-            print(f"  姿态: Roll={euler[0]:.2f}° Pitch={euler[1]:.2f}° Yaw={euler[2]:.2f}°")
-            print(f"  IMU加速度: {imu['linear_acceleration']}")
+        # 获取基座状态
+        base_state = env.get_base_state()
+        pos = base_state['position']
+        euler = base_state['orientation_euler']
+        
+        # 获取IMU数据
+        imu = env.get_imu_data()
+        
+        print(f"\nt={i*0.01:.2f}s:")
+        print(f"  位置: [{pos[0]:.3f}, {pos[1]:.3f}, {pos[2]:.3f}]")
+        print(f"  姿态: Roll={euler[0]:.2f}° Pitch={euler[1]:.2f}° Yaw={euler[2]:.2f}°")
+        print(f"  IMU加速度: {imu['linear_acceleration']}")
         
-        time.sleep(0.01)
+        # 其余步不读状态，批量执行
+        env.run_steps(49)
+        time.sleep(0.5)
     
-    env.close()
+    if own_env:
+        env.close()
     print("\n✅ 示例3完成\n")
 
 
-def example_4_stability_evaluation():
+def example_4_stability_evaluation(env: SimulationEnvironment = None):
     """示例4: 稳定性评估"""
     print("\n" + "="*60)
     print("示例4: 稳定性评估")
     print("="*60)
     
-    base_path = Path(__file__).parent.parent
-    config_path = base_path / 'config' / 'robot_config.yaml'
-    urdf_path = base_path / 'models' / 'humanoid_v1.urdf'
-    
-    env = SimulationEnvironment(str(config_path), gui=True)
-    env.setup_world()
-    env.load_robot(str(urdf_path))
+    own_env = env is None
+    if own_env:
+        env = make_env()
     
     # 创建评估器
     metrics = StabilityMetrics()
     
     print("\n收集3秒数据...")
     
-    for i in range(300):  # 3秒
+    num_samples = 300  # 3秒
+    pos_buf = np.empty((num_samples, 3))
+    rpy_buf = np.empty((num_samples, 3))
+    vel_buf = np.empty((num_samples, 3))
+    torque_buf = np.empty(num_samples)
+    pacer = RatePacer(100)  # 100Hz
+    
+    for i in range(num_samples):
         env.step()
         
-        # 获取状态
+        # 获取状态（先写入缓冲区，结束后统一更新指标）
         base_state = env.get_base_state()
-        joint_states = env.get_joint_states()
-        imu_data = env.get_imu_data()
+        _, _, joint_torques = env.get_joint_state_arrays()
         
-        # 更新指标
-        metrics.update(base_state, joint_states, imu_data)
+        pos_buf[i] = base_state['position']
+        rpy_buf[i] = base_state['orientation_euler']
+        vel_buf[i] = base_state['linear_velocity']
+        torque_buf[i] = np.abs(joint_torques).sum()
         
-        time.sleep(0.01)
+        pacer.wait()
+    
+    # 更新指标
+    metrics.update_batch(pos_buf, rpy_buf, vel_buf, torque_buf)
     
     # 打印评估结果
     print("\n" + "="*60)
@@ -162,23 +170,20 @@ def example_4_stability_evaluation():
     print("="*60)
     metrics.print_summary()
     
-    env.close()
+    if own_env:
+        env.close()
     print("\n✅ 示例4完成\n")
 
 
-def example_5_custom_test():
+def example_5_custom_test(env: SimulationEnvironment = None):
     """示例5: 自定义测试"""
     print("\n" + "="*60)
     print("示例5: 自定义测试 - 摆动测试")
     print("="*60)
     
-    base_path = Path(__file__).parent.parent
-    config_path = base_path / 'config' / 'robot_config.yaml'
-    urdf_path = base_path / 'models' / 'humanoid_v1.urdf'
-    
-    env = SimulationEnvironment(str(config_path), gui=True)
-    env.setup_world()
-    env.load_robot(str(urdf_path))
+    own_env = env is None
+    if own_env:
+        env = make_env()
     
     print("\n让机器人摆动膝关节...")
     
@@ -202,15 +207,14 @@ def example_5_custom_test():
             'right_knee': angle
         })
         
-        env.step()
+        env.step_rt()
         
         # 每秒打印一次
         if i % int(1.0 / time_step) == 0:
             print(f"t={t:.2f}s | 膝关节角度={angle:.2f}°")
-        
-        time.sleep(time_step)
     
-    env.close()
+    if own_env:
+        env.close()
     print("\n✅ 示例5完成\n")
 
 
@@ -238,8 +242,12 @@ def main():
     }
     
     if choice == '0':
+        # 共用一个环境，示例之间只重置机器人状态，避免重复加载
+        env = make_env()
         for func in examples.values():
-            func()
+            func(env)
+            env.reset_robot_state()
+        env.close()
     elif choice in examples:
         examples[choice]()
     else:
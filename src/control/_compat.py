@@ -0,0 +1,12 @@
+"""
+兼容性辅助
+
+dataclass(slots=True) 需要 Python 3.10+；requirements.txt 在 3.9 上测试，
+旧版本下退化为普通 dataclass（行为一致，只是属性访问稍慢）。
+"""
+
+import sys
+
+
+# 用法: @dataclass(**DATACLASS_SLOTS)
+DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
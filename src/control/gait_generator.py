@@ -9,11 +9,12 @@
 足端轨迹使用正弦曲线生成，保证连续平滑。
 """
 
-import numpy as np
+import math
 from enum import Enum, auto
 from typing import Dict, Tuple
 from dataclasses import dataclass
 
+from src.control._compat import DATACLASS_SLOTS
 from src.control.inverse_kinematics import compute_leg_joints, LegGeometry
 
 
@@ -24,7 +25,19 @@ class GaitPhase(Enum):
     RIGHT_SWING    = auto()   # 右脚摆动（左脚支撑）
 
 
-@dataclass
+# 内部用整数表示阶段（比枚举比较快），下标对应 _PHASES / _PHASE_NAMES
+_DS, _LEFT, _RIGHT = 0, 1, 2
+_PHASES = (GaitPhase.DOUBLE_SUPPORT, GaitPhase.LEFT_SWING, GaitPhase.RIGHT_SWING)
+_PHASE_NAMES = ("双足支撑", "左脚摆动", "右脚摆动")
+
+# 摆动侧 → (摆动腿 hip_pitch, 支撑腿 ankle_pitch)，避免每次拼接关节名
+_SWING_SUPPORT_KEYS = {
+    'left':  ('left_hip_pitch',  'right_ankle_pitch'),
+    'right': ('right_hip_pitch', 'left_ankle_pitch'),
+}
+
+
+@dataclass(**DATACLASS_SLOTS)
 class GaitParams:
     """步态参数"""
     step_height: float = 0.02    # 抬脚高度 (m)
@@ -39,37 +52,175 @@ class GaitParams:
     foot_z_stand:  float = -0.22 # 站立时脚到髋关节的垂直距离 (m)
 
 
+def _direct_joint_kernel(phase: int, progress: float, step_count: int,
+                         consts: Tuple[float, ...]) -> Tuple[float, ...]:
+    """直接关节规划的计算核心（纯标量）
+
+    progress 为当前阶段进度 [0, 1]（双足支撑期即重心转移进度）。
+
+    每个控制周期都会调用：标量三角函数用 math 而非 numpy，
+    仅依赖参数的量由 GaitGenerator._update_durations 预先打包在 consts 中。
+
+    Returns:
+        按 GaitGenerator.JOINT_NAMES 顺序的关节角度（度）
+    """
+    (knee_target, hip_pitch_target, ankle_target, com_roll_max,
+     fwd_bias, ankle_push, hip_push, turn_bias) = consts
+    
+    if phase == _DS:
+        # 双足支撑期: 无摆动，只做重心侧移
+        shift = com_roll_max * math.sin(math.pi * progress * 0.5)
+        if step_count % 2 == 0:
+            # 下一步左脚摆动 → 重心向右
+            com_roll = -shift
+        else:
+            com_roll = shift
+    else:
+        # 摆动轮廓：正弦曲线（平滑上升下降）
+        swing_profile = math.sin(math.pi * progress)  # 0→1→0
+        if phase == _LEFT:
+            com_roll = -com_roll_max  # 重心在右侧
+        else:
+            com_roll = com_roll_max   # 重心在左侧
+    
+    # 基准: 侧向重心转移 + 持续前进偏置 (作用于所有阶段)
+    # 正 hip_pitch → 机器人向 -x 移动 (实验确认)
+    l_roll,  r_roll  = com_roll * 0.3, -com_roll * 0.3
+    l_hip,   r_hip   = fwd_bias, fwd_bias
+    l_knee,  r_knee  = 0.0, 0.0
+    l_ankle, r_ankle = -fwd_bias * 0.5, -fwd_bias * 0.5
+    
+    if phase == _LEFT:
+        # 转向: 左右腿 hip_pitch 不对称 → 产生 yaw 力矩
+        # 正turn_rate = 逆时针
+        # 左脚多推(正hip_pitch) + 右脚少推 → 身体逆时针转
+        if turn_bias != 0.0:
+            r_hip  += turn_bias * swing_profile
+            l_roll += turn_bias * 0.3 * swing_profile
+        
+        l_knee  = knee_target * swing_profile
+        l_hip   = hip_pitch_target * swing_profile + fwd_bias
+        l_ankle = ankle_target * swing_profile - fwd_bias * 0.5
+        # 支撑腿(右)额外推力
+        r_ankle += -ankle_push * progress
+        r_hip   += hip_push * progress
+        
+    elif phase == _RIGHT:
+        if turn_bias != 0.0:
+            l_hip  -= turn_bias * swing_profile
+            r_roll -= turn_bias * 0.3 * swing_profile
+        
+        r_knee  = knee_target * swing_profile
+        r_hip   = hip_pitch_target * swing_profile + fwd_bias
+        r_ankle = ankle_target * swing_profile - fwd_bias * 0.5
+        l_ankle += -ankle_push * progress
+        l_hip   += hip_push * progress
+    
+    return (0.0,
+            l_roll, l_hip, l_knee, l_ankle,
+            r_roll, r_hip, r_knee, r_ankle)
+
+
 class GaitGenerator:
     """步态生成器
     
     根据当前时间输出双腿关节目标角度。
     """
     
+    # 输出关节顺序（与 StandingController.base_pose 一致）
+    JOINT_NAMES = (
+        'head_pitch',
+        'left_hip_roll',  'left_hip_pitch',  'left_knee',  'left_ankle_pitch',
+        'right_hip_roll', 'right_hip_pitch', 'right_knee', 'right_ankle_pitch',
+    )
+    
+    __slots__ = (
+        'params', 'geom', 'total_time', 'step_count',
+        'double_dur', 'swing_dur', '_gait_consts',
+        '_phase_idx', 'phase_time', '_progress', '_progress_rate',
+        '_joint_out', '_static_phases', '_cached_phase',
+    )
+    
     def __init__(self, params: GaitParams = None):
         self.params = params or GaitParams()
         self.geom = LegGeometry()
         
-        self.phase = GaitPhase.DOUBLE_SUPPORT
-        self.phase_time = 0.0       # 当前阶段已持续时间
+        # update() 的输出字典，每步原地覆盖（键固定为 JOINT_NAMES）
+        self._joint_out = dict.fromkeys(self.JOINT_NAMES, 0.0)
+        
         self.total_time = 0.0       # 总时间
         self.step_count = 0
         
         # 每个阶段的持续时间
         self._update_durations()
+        
+        # 当前阶段（见 _PHASES）、阶段已持续时间及进度
+        self._enter_phase(_DS)
     
     def _update_durations(self):
-        """根据参数计算各阶段时长"""
-        T = self.params.step_period
-        dr = self.params.double_support_ratio
+        """根据参数计算各阶段时长，以及只依赖参数的派生量
+        
+        直接修改 self.params 后需重新调用本方法。
+        """
+        p = self.params
+        T = p.step_period
+        dr = p.double_support_ratio
         self.double_dur = T * dr       # 双足支撑时长
         self.swing_dur  = T * (1 - dr) # 摆动时长
+        
+        # 抬脚高度转换为膝盖弯曲角度
+        # knee 每弯曲10°约抬起: calf*(1-cos(10°))≈0.1*0.015=0.15cm
+        # 所以抬2cm需要约 knee=35°
+        # 但同时hip_pitch需要一点点补偿（约knee角度的1/4）
+        knee_target = 35.0 * (p.step_height / 0.02)       # 按2cm为基准缩放
+        hip_pitch_target = -5.0 * (p.step_height / 0.02)  # 微小的髋关节前倾
+        # 保持脚底水平，并限制ankle在合理范围
+        ankle_target = min(max(-(knee_target + hip_pitch_target), -30.0), 30.0)
+        
+        # 打包给 _direct_joint_kernel（顺序与其解包一致）
+        self._gait_consts = (
+            knee_target,
+            hip_pitch_target,
+            ankle_target,
+            p.com_shift_y * 100,   # 重心侧移对应的roll (度)
+            p.step_length * 10.0,  # 前进偏置: 10cm → 1度
+            p.step_length * 15.0,  # 支撑腿ankle额外推力
+            p.step_length * 20.0,  # 支撑腿hip额外推力
+            p.turn_rate * 0.5,     # 转向偏置（保守映射）
+        )
+        
+        # 各阶段输出是否与阶段进度无关（原地静止时成立）：
+        #   双足支撑期只有重心侧移随进度变化；
+        #   摆动期的抬脚、推力、转向项均随进度变化。
+        # 这样的阶段内每步输出相同，可直接复用上一次的结果
+        (_, _, _, com_roll_max, _, ankle_push, hip_push, turn_bias) = self._gait_consts
+        swing_static = (knee_target == 0.0 and hip_pitch_target == 0.0
+                        and ankle_target == 0.0 and ankle_push == 0.0
+                        and hip_push == 0.0 and turn_bias == 0.0)
+        self._static_phases = (com_roll_max == 0.0, swing_static, swing_static)
+        self._cached_phase = None  # _joint_out 中缓存的静止阶段，None=无
     
     def reset(self):
         """重置状态机"""
-        self.phase = GaitPhase.DOUBLE_SUPPORT
-        self.phase_time = 0.0
         self.total_time = 0.0
         self.step_count = 0
+        self._enter_phase(_DS)
+    
+    def _enter_phase(self, idx: int):
+        """进入新阶段: 清零阶段计时，按阶段时长设定进度增长率
+        
+        进度 self._progress 每步累加 dt * 增长率，省去每步的除法；
+        阶段时长为0时进度直接为1。
+        """
+        self._phase_idx = idx
+        self.phase_time = 0.0
+        dur = self.double_dur if idx == _DS else self.swing_dur
+        if dur > 0:
+            self._progress = 0.0
+            self._progress_rate = 1.0 / dur
+        else:
+            self._progress = 1.0
+            self._progress_rate = 0.0
     
     def set_velocity(self, forward: float = 0.0, turn: float = 0.0):
         """设置行走速度命令
@@ -80,12 +231,14 @@ class GaitGenerator:
         """
         self.params.step_length = forward
         self.params.turn_rate = turn
+        self._update_durations()
     
     def stop(self):
         """停止行走（完成当前步后停下）"""
         self.params.step_length = 0.0
         self.params.turn_rate = 0.0
         self.params.step_height = 0.0  # 不再抬脚
+        self._update_durations()
     
     def update(self, dt: float) -> Dict[str, float]:
         """步进一步，返回关节目标角度
@@ -94,34 +247,35 @@ class GaitGenerator:
             dt: 时间步长 (s)
             
         Returns:
-            所有关节名 → 目标角度（度）
+            所有关节名 → 目标角度（度）。该字典由生成器持有并在下一次
+            update() 时被覆盖（静止时也可能被原样复用），调用方不要原地
+            修改；需跨步保留请自行 copy。
         """
         self.phase_time += dt
         self.total_time += dt
+        self._progress += dt * self._progress_rate
         
         # 状态转换
         self._check_transition()
         
+        # 累加误差可能略超1，限幅一次
+        if self._progress > 1.0:
+            self._progress = 1.0
+        
         # 直接规划关节角度（避免IK的大角度hip_pitch导致前倾）
         joints = self._compute_joint_angles_direct()
         return joints
     
     def _check_transition(self):
         """检查是否需要切换阶段"""
-        if self.phase == GaitPhase.DOUBLE_SUPPORT:
+        if self._phase_idx == _DS:
             if self.phase_time >= self.double_dur:
-                self.phase_time = 0.0
-                # 交替左右摆动
-                if self.step_count % 2 == 0:
-                    self.phase = GaitPhase.LEFT_SWING
-                else:
-                    self.phase = GaitPhase.RIGHT_SWING
+                # 交替左右摆动: 偶数步 → 左脚, 奇数步 → 右脚
+                self._enter_phase(_LEFT + self.step_count % 2)
                     
-        elif self.phase in (GaitPhase.LEFT_SWING, GaitPhase.RIGHT_SWING):
-            if self.phase_time >= self.swing_dur:
-                self.phase_time = 0.0
-                self.phase = GaitPhase.DOUBLE_SUPPORT
-                self.step_count += 1
+        elif self.phase_time >= self.swing_dur:
+            self.step_count += 1
+            self._enter_phase(_DS)
     
     def _compute_foot_targets(self) -> Tuple[Tuple[float, float],
                                               Tuple[float, float],
@@ -135,30 +289,28 @@ class GaitGenerator:
         p = self.params
         x0 = p.foot_x_offset
         z0 = p.foot_z_stand
+        phase = self._phase_idx
         
         # 摆动进度 [0, 1]
-        if self.phase in (GaitPhase.LEFT_SWING, GaitPhase.RIGHT_SWING):
-            progress = min(self.phase_time / self.swing_dur, 1.0)
-        else:
-            progress = 0.0
+        progress = self._progress if phase != _DS else 0.0
         
         # 足端高度轨迹：正弦曲线
-        lift = p.step_height * np.sin(np.pi * progress)
+        lift = p.step_height * math.sin(math.pi * progress)
         
         # 足端前后轨迹：余弦曲线（半步长）
-        forward = p.step_length * 0.5 * (1 - np.cos(np.pi * progress))
+        forward = p.step_length * 0.5 * (1 - math.cos(math.pi * progress))
         
         # 双足支撑期的重心转移（为下一次摆动做准备）
-        if self.phase == GaitPhase.DOUBLE_SUPPORT:
-            ds_progress = min(self.phase_time / self.double_dur, 1.0) if self.double_dur > 0 else 1.0
+        if phase == _DS:
+            ds_progress = self._progress
             # 下一步是哪只脚摆动？
             if self.step_count % 2 == 0:
                 # 下一步左脚摆动 → 重心移向右侧
-                com_roll = -p.com_shift_y * 100.0 * np.sin(np.pi * ds_progress * 0.5)
+                com_roll = -p.com_shift_y * 100.0 * math.sin(math.pi * ds_progress * 0.5)
             else:
                 # 下一步右脚摆动 → 重心移向左侧
-                com_roll = p.com_shift_y * 100.0 * np.sin(np.pi * ds_progress * 0.5)
-        elif self.phase == GaitPhase.LEFT_SWING:
+                com_roll = p.com_shift_y * 100.0 * math.sin(math.pi * ds_progress * 0.5)
+        elif phase == _LEFT:
             # 左脚摆动，重心在右侧
             com_roll = -p.com_shift_y * 100.0
         else:
@@ -166,15 +318,15 @@ class GaitGenerator:
             com_roll = p.com_shift_y * 100.0
         
         # 根据阶段设置足端位置
-        if self.phase == GaitPhase.DOUBLE_SUPPORT:
+        if phase == _DS:
             left_foot  = (x0, z0)
             right_foot = (x0, z0)
             
-        elif self.phase == GaitPhase.LEFT_SWING:
+        elif phase == _LEFT:
             left_foot  = (x0 + forward, z0 + lift)
             right_foot = (x0, z0)
             
-        elif self.phase == GaitPhase.RIGHT_SWING:
+        elif phase == _RIGHT:
             left_foot  = (x0, z0)
             right_foot = (x0 + forward, z0 + lift)
         
@@ -190,16 +342,13 @@ class GaitGenerator:
         if swing_side == 'none':
             return joints
         
-        # 获取摆动腿的hip_pitch（负值=前倾）
-        swing_hip = joints.get(f'{swing_side}_hip_pitch', 0.0)
-        
-        # 支撑腿侧
-        support = 'right' if swing_side == 'left' else 'left'
+        # 摆动腿 hip_pitch 键, 支撑腿 ankle_pitch 键
+        # joints 需包含全部 JOINT_NAMES（update() 的输出总是满足）
+        swing_key, support_key = _SWING_SUPPORT_KEYS[swing_side]
         
         # 支撑腿ankle往正方向推（后仰），补偿前倾
-        # 补偿比例: 摆动腿每前倾1°, 支撑腿ankle补偿约0.3°
-        compensation = -swing_hip * 0.3
-        joints[f'{support}_ankle_pitch'] = joints.get(f'{support}_ankle_pitch', 0.0) + compensation
+        # 补偿比例: 摆动腿每前倾1°(hip_pitch负值), 支撑腿ankle补偿约0.3°
+        joints[support_key] += -joints[swing_key] * 0.3
         
         return joints
 
@@ -212,95 +361,23 @@ class GaitGenerator:
           - 通过hip_roll做侧向重心转移
         
         这样避免了IK产生大角度hip_pitch导致躯干前倾的问题。
+        具体计算见 _direct_joint_kernel。
         """
-        p = self.params
+        idx = self._phase_idx
+        out = self._joint_out
+        if idx == self._cached_phase:
+            return out
         
-        # 摆动进度 [0, 1]
-        if self.phase in (GaitPhase.LEFT_SWING, GaitPhase.RIGHT_SWING):
-            progress = min(self.phase_time / self.swing_dur, 1.0)
-        else:
-            progress = 0.0
-        
-        # 摆动轮廓：正弦曲线（平滑上升下降）
-        swing_profile = np.sin(np.pi * progress)  # 0→1→0
-        
-        # 抬脚高度转换为膝盖弯曲角度
-        # knee 每弯曲10°约抬起: calf*(1-cos(10°))≈0.1*0.015=0.15cm
-        # 所以抬2cm需要约 knee=35°
-        # 但同时hip_pitch需要一点点补偿（约knee角度的1/4）
-        knee_target = 35.0 * (p.step_height / 0.02)  # 按2cm为基准缩放
-        hip_pitch_target = -5.0 * (p.step_height / 0.02)  # 微小的髋关节前倾
-        ankle_target = -(knee_target + hip_pitch_target)  # 保持脚底水平
-        # 限制ankle在合理范围
-        ankle_target = np.clip(ankle_target, -30.0, 30.0)
-        
-        # 重心侧移
-        if self.phase == GaitPhase.DOUBLE_SUPPORT:
-            ds_progress = min(self.phase_time / self.double_dur, 1.0) if self.double_dur > 0 else 1.0
-            if self.step_count % 2 == 0:
-                # 下一步左脚摆动 → 重心向右
-                com_roll = -p.com_shift_y * 100 * np.sin(np.pi * ds_progress * 0.5)
-            else:
-                com_roll = p.com_shift_y * 100 * np.sin(np.pi * ds_progress * 0.5)
-        elif self.phase == GaitPhase.LEFT_SWING:
-            com_roll = -p.com_shift_y * 100  # 重心在右侧
-        else:
-            com_roll = p.com_shift_y * 100  # 重心在左侧
-        
-        # 持续前进偏置 (作用于所有阶段)
-        # 正 hip_pitch → 机器人向 -x 移动 (实验确认)
-        fwd_bias = p.step_length * 10.0   # 10cm → 1度的持续偏置
-        
-        # 构建关节角度
-        joints = {
-            'head_pitch': 0.0,
-            'left_hip_roll': 0.0,  'left_hip_pitch': fwd_bias,
-            'left_knee': 0.0,      'left_ankle_pitch': -fwd_bias * 0.5,
-            'right_hip_roll': 0.0, 'right_hip_pitch': fwd_bias,
-            'right_knee': 0.0,     'right_ankle_pitch': -fwd_bias * 0.5,
-        }
-        
-        # 侧向重心转移
-        joints['left_hip_roll']  =  com_roll * 0.3
-        joints['right_hip_roll'] = -com_roll * 0.3
-        
-        # 转向: 左右腿 hip_pitch 不对称 → 产生 yaw 力矩
-        # 正turn_rate = 逆时针
-        # 左脚多推(正hip_pitch) + 右脚少推 → 身体逆时针转
-        if p.turn_rate != 0.0 and self.phase != GaitPhase.DOUBLE_SUPPORT:
-            turn_bias = p.turn_rate * 0.5  # 保守映射
-            if self.phase == GaitPhase.LEFT_SWING:
-                joints['right_hip_pitch'] += turn_bias * swing_profile
-                joints['left_hip_roll']   += turn_bias * 0.3 * swing_profile
-            elif self.phase == GaitPhase.RIGHT_SWING:
-                joints['left_hip_pitch']  -= turn_bias * swing_profile
-                joints['right_hip_roll']  -= turn_bias * 0.3 * swing_profile
-        
-        # 支撑腿额外推力
-        ankle_push = p.step_length * 15.0
-        hip_push   = p.step_length * 20.0
+        out.update(zip(self.JOINT_NAMES, _direct_joint_kernel(
+            idx, self._progress, self.step_count, self._gait_consts)))
+        self._cached_phase = idx if self._static_phases[idx] else None
+        return out
 
-        if self.phase == GaitPhase.LEFT_SWING:
-            joints['left_knee']         = knee_target * swing_profile
-            joints['left_hip_pitch']    = hip_pitch_target * swing_profile + fwd_bias
-            joints['left_ankle_pitch']  = ankle_target * swing_profile - fwd_bias * 0.5
-            # 支撑腿(右)额外推力
-            joints['right_ankle_pitch'] += -ankle_push * progress
-            joints['right_hip_pitch']   += hip_push * progress
-            
-        elif self.phase == GaitPhase.RIGHT_SWING:
-            joints['right_knee']        = knee_target * swing_profile
-            joints['right_hip_pitch']   = hip_pitch_target * swing_profile + fwd_bias
-            joints['right_ankle_pitch'] = ankle_target * swing_profile - fwd_bias * 0.5
-            joints['left_ankle_pitch']  += -ankle_push * progress
-            joints['left_hip_pitch']    += hip_push * progress
-        
-        return joints
+    @property
+    def phase(self) -> GaitPhase:
+        """当前步态阶段"""
+        return _PHASES[self._phase_idx]
 
     @property
     def phase_name(self) -> str:
-        return {
-            GaitPhase.DOUBLE_SUPPORT: "双足支撑",
-            GaitPhase.LEFT_SWING:     "左脚摆动",
-            GaitPhase.RIGHT_SWING:    "右脚摆动",
-        }[self.phase]
+        return _PHASE_NAMES[self._phase_idx]
@@ -13,12 +13,22 @@
       roll方向单独处理。
 """
 
-import numpy as np
-from typing import Dict, Optional
+import math
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
 from dataclasses import dataclass
 
+from src.control._compat import DATACLASS_SLOTS
 
-@dataclass
+
+# IK 缓存的目标位置量化精度（小数位数）: 4 → 0.1mm，远小于舵机精度
+_IK_QUANT_DECIMALS = 4
+
+# 弧度 → 度（常量乘法，避免逐个调用转换函数）
+_RAD2DEG = 180.0 / math.pi
+
+
+@dataclass(**DATACLASS_SLOTS)
 class LegGeometry:
     """腿部几何参数（来自URDF）"""
     thigh_length: float = 0.12   # 大腿长度 (m)
@@ -27,31 +37,17 @@ class LegGeometry:
     hip_offset_z: float = 0.075  # 髋关节相对躯干的下偏移 (m)
 
 
-def solve_leg_ik(target_x: float, target_z: float,
-                 geom: LegGeometry = None) -> Optional[Dict[str, float]]:
-    """2-link 平面逆运动学
-
-    在 sagittal 平面内求解 hip_pitch 和 knee 角度，
-    使脚踝(ankle)到达相对于髋关节的目标位置 (target_x, target_z)。
+def _leg_ik_core(dx: float, dz: float,
+                 L1: float, L2: float) -> Tuple[float, float, float]:
+    """2-link IK 核心计算（纯标量，弧度）
 
-    坐标系定义（相对于髋关节）:
-      x: 前方为正
-      z: 下方为负
+    只用 math 标量函数，避免 numpy 标量 ufunc 的调用开销。
 
-    Args:
-        target_x: 脚踝相对于髋关节的前方偏移 (m)
-        target_z: 脚踝相对于髋关节的垂直偏移 (m)，向下为负
-    
     Returns:
-        {'hip_pitch': deg, 'knee': deg, 'ankle_pitch': deg} 或 None（不可达）
+        (hip_pitch, knee, ankle_pitch) 弧度
     """
-    geom = geom or LegGeometry()
-    L1 = geom.thigh_length
-    L2 = geom.calf_length
-
     # 脚踝到髋关节距离
-    dx, dz = target_x, target_z  # dz < 0 (脚在髋关节下方)
-    d = np.sqrt(dx**2 + dz**2)
+    d = math.sqrt(dx * dx + dz * dz)
 
     # 可达性检查（留足够余量以包含边界）
     max_reach = L1 + L2
@@ -63,24 +59,62 @@ def solve_leg_ik(target_x: float, target_z: float,
         d = min_reach + 1e-6
 
     # 余弦定理求膝关节角度
-    cos_knee = (L1**2 + L2**2 - d**2) / (2 * L1 * L2)
-    cos_knee = np.clip(cos_knee, -1.0, 1.0)
-    knee_angle = np.pi - np.arccos(cos_knee)  # 0=全伸直, >0=弯曲
+    cos_knee = (L1 * L1 + L2 * L2 - d * d) / (2 * L1 * L2)
+    cos_knee = min(max(cos_knee, -1.0), 1.0)
+    knee_angle = math.pi - math.acos(cos_knee)  # 0=全伸直, >0=弯曲
 
     # 求 hip_pitch
-    alpha = np.arctan2(-dx, -dz)  # 目标方向角（注意z向下为负）
-    cos_beta = (L1**2 + d**2 - L2**2) / (2 * L1 * d)
-    cos_beta = np.clip(cos_beta, -1.0, 1.0)
-    beta = np.arccos(cos_beta)
+    alpha = math.atan2(-dx, -dz)  # 目标方向角（注意z向下为负）
+    cos_beta = (L1 * L1 + d * d - L2 * L2) / (2 * L1 * d)
+    cos_beta = min(max(cos_beta, -1.0), 1.0)
+    beta = math.acos(cos_beta)
     hip_pitch = alpha - beta  # 负值=前倾
 
     # ankle_pitch 保持脚底水平
     ankle_pitch = -(hip_pitch + knee_angle)
 
+    return hip_pitch, knee_angle, ankle_pitch
+
+
+@lru_cache(maxsize=4096)
+def _leg_ik_cached(dx_q: float, dz_q: float,
+                   L1: float, L2: float) -> Tuple[float, float, float]:
+    """按量化后的目标位置缓存 _leg_ik_core 结果
+
+    原地踏步/静止站立时目标位置会反复出现，命中缓存后只需一次字典查找。
+    """
+    return _leg_ik_core(dx_q, dz_q, L1, L2)
+
+
+def solve_leg_ik(target_x: float, target_z: float,
+                 geom: LegGeometry = None) -> Optional[Dict[str, float]]:
+    """2-link 平面逆运动学
+
+    在 sagittal 平面内求解 hip_pitch 和 knee 角度，
+    使脚踝(ankle)到达相对于髋关节的目标位置 (target_x, target_z)。
+
+    坐标系定义（相对于髋关节）:
+      x: 前方为正
+      z: 下方为负
+
+    目标位置按 0.1mm 量化后查缓存（见 _leg_ik_cached）。
+
+    Args:
+        target_x: 脚踝相对于髋关节的前方偏移 (m)
+        target_z: 脚踝相对于髋关节的垂直偏移 (m)，向下为负
+    
+    Returns:
+        {'hip_pitch': deg, 'knee': deg, 'ankle_pitch': deg} 或 None（不可达）
+    """
+    geom = geom or LegGeometry()
+    hip_pitch, knee_angle, ankle_pitch = _leg_ik_cached(
+        round(target_x, _IK_QUANT_DECIMALS), round(target_z, _IK_QUANT_DECIMALS),
+        geom.thigh_length, geom.calf_length)
+
     return {
-        'hip_pitch':    np.rad2deg(hip_pitch),
-        'knee':         np.rad2deg(knee_angle),
-        'ankle_pitch':  np.rad2deg(ankle_pitch),
+        'hip_pitch':    hip_pitch   * _RAD2DEG,
+        'knee':         knee_angle  * _RAD2DEG,
+        'ankle_pitch':  ankle_pitch * _RAD2DEG,
     }
 
 
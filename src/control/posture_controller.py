@@ -9,12 +9,35 @@
   - 基准姿态：所有校正量都是在基准姿态上叠加的偏移
 """
 
-import numpy as np
 from typing import Dict, Tuple
 from dataclasses import dataclass
 
+from src.control._compat import DATACLASS_SLOTS
 
-@dataclass
+
+# 姿态校正 → 关节偏移的权重表: (关节名, roll权重, pitch权重)
+#   roll  → 两侧 hip_roll 反向调整
+#   pitch → 髋关节 pitch + 踝关节 pitch 协同
+_POSTURE_MIX = (
+    ('left_hip_roll',      0.3,  0.0),
+    ('right_hip_roll',    -0.3,  0.0),
+    ('left_hip_pitch',     0.0,  0.3),
+    ('right_hip_pitch',    0.0,  0.3),
+    ('left_ankle_pitch',   0.0, -0.2),
+    ('right_ankle_pitch',  0.0, -0.2),
+)
+
+# 高度校正(m) → 关节偏移(度) 的权重表: (关节名, 每米对应角度)
+#   正的校正 = 需要升高 = 膝盖伸直 = 膝关节角度减小
+_LEG_EXTENSION_MIX = (
+    ('left_knee',       -150.0),
+    ('right_knee',      -150.0),
+    ('left_hip_pitch',    75.0),
+    ('right_hip_pitch',   75.0),
+)
+
+
+@dataclass(**DATACLASS_SLOTS)
 class PIDGains:
     """PID控制器增益参数"""
     kp: float = 1.0
@@ -45,6 +68,9 @@ class PostureController:
 
         self.integral_limit = 5.0  # 积分限幅（度·秒）
 
+        # 关节偏移输出缓冲（每个控制周期原地覆盖，避免重复分配字典）
+        self._corr_buf = {name: 0.0 for name, _, _ in _POSTURE_MIX}
+
     def reset(self):
         self._ri = self._pi = 0.0
         self._re = self._pe = 0.0
@@ -54,8 +80,10 @@ class PostureController:
         re = self.target_roll  - roll
         pe = self.target_pitch - pitch
 
-        self._ri = np.clip(self._ri + re * dt, -self.integral_limit, self.integral_limit)
-        self._pi = np.clip(self._pi + pe * dt, -self.integral_limit, self.integral_limit)
+        # 标量限幅用 min/max（np.clip 对标量的调用开销远大于计算本身）
+        lim = self.integral_limit
+        self._ri = max(-lim, min(lim, self._ri + re * dt))
+        self._pi = max(-lim, min(lim, self._pi + pe * dt))
 
         rd = (re - self._re) / dt if dt > 0 else 0.0
         pd = (pe - self._pe) / dt if dt > 0 else 0.0
@@ -66,22 +94,16 @@ class PostureController:
         self._re, self._pe = re, pe
         return rc, pc
 
-    @staticmethod
-    def compute_joint_corrections(roll_corr: float, pitch_corr: float) -> Dict[str, float]:
+    def compute_joint_corrections(self, roll_corr: float, pitch_corr: float) -> Dict[str, float]:
         """姿态校正 → 关节偏移（度）
 
-        策略：
-          roll  → 两侧 hip_roll 反向调整
-          pitch → 髋关节 pitch + 踝关节 pitch 协同
+        策略见 _POSTURE_MIX。返回的字典在下次调用时会被覆盖，
+        如需保留请自行 copy()。
         """
-        return {
-            'left_hip_roll':     roll_corr  *  0.3,
-            'right_hip_roll':    roll_corr  * -0.3,
-            'left_hip_pitch':    pitch_corr *  0.3,
-            'right_hip_pitch':   pitch_corr *  0.3,
-            'left_ankle_pitch':  pitch_corr * -0.2,
-            'right_ankle_pitch': pitch_corr * -0.2,
-        }
+        buf = self._corr_buf
+        for name, wr, wp in _POSTURE_MIX:
+            buf[name] = roll_corr * wr + pitch_corr * wp
+        return buf
 
 
 class CenterOfMassController:
@@ -93,28 +115,28 @@ class CenterOfMassController:
         self._i = 0.0
         self._e = 0.0
 
+        # 关节偏移输出缓冲（原地覆盖）
+        self._ext_buf = {name: 0.0 for name, _ in _LEG_EXTENSION_MIX}
+
     def reset(self):
         self._i = self._e = 0.0
 
     def update(self, height: float, dt: float) -> float:
         e  = self.target - height
-        self._i = np.clip(self._i + e * dt, -0.05, 0.05)
+        self._i = max(-0.05, min(0.05, self._i + e * dt))
         d  = (e - self._e) / dt if dt > 0 else 0.0
         self._e = e
         return self.gains.kp * e + self.gains.ki * self._i + self.gains.kd * d
 
-    @staticmethod
-    def compute_leg_extension(h_corr: float) -> Dict[str, float]:
-        """高度校正(m) → 关节偏移(度)  简化线性映射"""
-        # 正的校正 = 需要升高 = 膝盖伸直 = 膝关节角度减小
-        knee = -h_corr * 150.0   # 每米 → 150度
-        hip  =  h_corr *  75.0
-        return {
-            'left_knee':       knee,
-            'right_knee':      knee,
-            'left_hip_pitch':  hip,
-            'right_hip_pitch': hip,
-        }
+    def compute_leg_extension(self, h_corr: float) -> Dict[str, float]:
+        """高度校正(m) → 关节偏移(度)  简化线性映射
+
+        权重见 _LEG_EXTENSION_MIX。返回的字典在下次调用时会被覆盖。
+        """
+        buf = self._ext_buf
+        for name, w in _LEG_EXTENSION_MIX:
+            buf[name] = h_corr * w
+        return buf
 
 
 class StandingController:
@@ -144,29 +166,45 @@ class StandingController:
         # 每个控制周期单关节最大校正（度）
         self.max_correction = 3.0
 
+        self._build_mix_rows()
+
     def reset(self):
         self.posture.reset()
         self.com.reset()
 
     def set_base_pose(self, pose: Dict[str, float]):
         self.base_pose.update(pose)
+        self._build_mix_rows()
+
+    def _build_mix_rows(self):
+        """预计算每个关节的 (关节名, 基准角, roll权重, pitch权重, 高度权重)
+
+        合并时直接按行计算偏移，省去中间字典和逐关节的 dict.get。
+        修改 base_pose 请通过 set_base_pose()，以便刷新此表。
+        """
+        w_posture = {name: (wr, wp) for name, wr, wp in _POSTURE_MIX}
+        w_height  = dict(_LEG_EXTENSION_MIX)
+        self._mix_rows = tuple(
+            (name, base_val) + w_posture.get(name, (0.0, 0.0)) + (w_height.get(name, 0.0),)
+            for name, base_val in self.base_pose.items()
+        )
 
     def compute_control(self, height: float, roll: float, pitch: float,
                         dt: float) -> Dict[str, float]:
         """计算关节目标角度（度）"""
         # 姿态补偿
         rc, pc = self.posture.update(roll, pitch, dt)
-        p_corr = self.posture.compute_joint_corrections(rc, pc)
 
         # 高度补偿
         hc = self.com.update(height, dt)
-        h_corr = self.com.compute_leg_extension(hc)
 
         # 合并：基准 + 姿态偏移 + 高度偏移（带限幅）
+        # 权重与 compute_joint_corrections / compute_leg_extension 相同
+        mc = self.max_correction
         out = {}
-        for jname, base_val in self.base_pose.items():
-            delta = p_corr.get(jname, 0.0) + h_corr.get(jname, 0.0)
-            delta = np.clip(delta, -self.max_correction, self.max_correction)
+        for jname, base_val, wr, wp, wh in self._mix_rows:
+            delta = (rc * wr + pc * wp) + hc * wh
+            delta = -mc if delta < -mc else (mc if delta > mc else delta)
             out[jname] = base_val + delta
 
         return out
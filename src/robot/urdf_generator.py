@@ -5,9 +5,58 @@
 采用程序化方式便于快速迭代和参数调整
 """
 
-import yaml
+import os
+import sys
 import math
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import List
+
+if not __package__:
+    # 直接以脚本运行时 (python src/robot/urdf_generator.py) 加入项目根目录
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.utils.config import load_config
+
+
+# 带几何体的 link 模板：visual / collision / inertial 共用几何体与原点偏移
+_LINK_TEMPLATE = """\
+  <link name="{name}">
+    <visual>
+      <geometry>
+        {geometry}
+      </geometry>
+{origin}{material}
+    </visual>
+    <collision>
+      <geometry>
+        {geometry}
+      </geometry>
+{origin}    </collision>
+    <inertial>
+{origin}      <mass value="{mass}"/>
+      <inertia ixx="{ixx}" ixy="0" ixz="0" iyy="{iyy}" iyz="0" izz="{izz}"/>
+    </inertial>
+  </link>"""
+
+
+# 转动关节模板
+_JOINT_TEMPLATE = """\
+  <joint name="{name}" type="revolute">
+    <parent link="{parent}"/>
+    <child link="{child}"/>
+    <origin xyz="{origin_xyz}" rpy="0 0 0"/>
+    <axis xyz="{axis_xyz}"/>
+{limit}
+  </joint>"""
+
+def _material(name: str, rgba: str = None) -> str:
+    """生成 visual 中的材质片段（不带 rgba 时引用已定义的同名材质）"""
+    if rgba is None:
+        return f'      <material name="{name}"/>'
+    return (f'      <material name="{name}">\n'
+            f'        <color rgba="{rgba}"/>\n'
+            f'      </material>')
 
 
 class URDFGenerator:
@@ -19,8 +68,7 @@ class URDFGenerator:
         Args:
             config_path: 配置文件路径
         """
-        with open(config_path, 'r', encoding='utf-8') as f:
-            self.config = yaml.safe_load(f)
+        self.config = load_config(str(config_path))
         
         self.robot = self.config['robot']
         self.urdf_lines = []
@@ -38,13 +86,36 @@ class URDFGenerator:
         self._add_legs()
         self._add_footer()
         
-        # 写入文件
+        # 写入文件：逐段写入带缓冲的文件句柄，不再先拼接成一个大字符串
         Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(self.urdf_lines))
+        with open(output_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            write = f.write
+            for i, line in enumerate(self.urdf_lines):
+                if i:
+                    write('\n')
+                write(line)
         
         print(f"✅ URDF文件已生成: {output_path}")
         
+    @staticmethod
+    def generate_many(config_paths: List[str], output_paths: List[str],
+                      max_workers: int = None):
+        """并行生成多份URDF（参数扫描用）
+        
+        每份配置相互独立，在进程池中各自解析配置并生成文件。
+        
+        Args:
+            config_paths: 配置文件路径列表
+            output_paths: 对应的输出文件路径列表
+            max_workers: 进程数，默认为CPU核数
+        """
+        if len(config_paths) != len(output_paths):
+            raise ValueError("config_paths 与 output_paths 长度不一致")
+        
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+            # list() 以便把子进程中的异常抛到调用方
+            list(pool.map(_generate_worker, config_paths, output_paths))
+        
     def _add_header(self):
         """添加XML头部"""
         self.urdf_lines.extend([
@@ -75,31 +146,17 @@ class URDFGenerator:
         dims = self.robot['link_dimensions']['torso']
         mass = self.robot['mass_distribution']['torso']
         
+        self.urdf_lines.append('  <!-- 躯干 -->')
+        self._add_link(
+            'torso',
+            f'<box size="{dims["width"]} {dims["depth"]} {dims["height"]}"/>',
+            _material('blue', '0.2 0.4 0.8 1.0'),
+            mass,
+            (self._box_inertia(mass, dims["depth"], dims["height"]),
+             self._box_inertia(mass, dims["width"], dims["height"]),
+             self._box_inertia(mass, dims["width"], dims["depth"])),
+        )
         self.urdf_lines.extend([
-            '  <!-- 躯干 -->',
-            '  <link name="torso">',
-            '    <visual>',
-            '      <geometry>',
-            f'        <box size="{dims["width"]} {dims["depth"]} {dims["height"]}"/>',
-            '      </geometry>',
-            '      <material name="blue">',
-            '        <color rgba="0.2 0.4 0.8 1.0"/>',
-            '      </material>',
-            '    </visual>',
-            '    <collision>',
-            '      <geometry>',
-            f'        <box size="{dims["width"]} {dims["depth"]} {dims["height"]}"/>',
-            '      </geometry>',
-            '    </collision>',
-            '    <inertial>',
-            f'      <mass value="{mass}"/>',
-            f'      <inertia ixx="{self._box_inertia(mass, dims["depth"], dims["height"])}" '
-            f'ixy="0" ixz="0" '
-            f'iyy="{self._box_inertia(mass, dims["width"], dims["height"])}" '
-            f'iyz="0" '
-            f'izz="{self._box_inertia(mass, dims["width"], dims["depth"])}"/>',
-            '    </inertial>',
-            '  </link>',
             '',
             '  <joint name="base_to_torso" type="fixed">',
             '    <parent link="base_link"/>',
@@ -115,43 +172,25 @@ class URDFGenerator:
         mass = self.robot['mass_distribution']['head']
         torso_height = self.robot['link_dimensions']['torso']['height']
         
-        self.urdf_lines.extend([
-            '  <!-- 头部 -->',
-            '  <link name="head">',
-            '    <visual>',
-            '      <geometry>',
-            f'        <sphere radius="{dims["radius"]}"/>',
-            '      </geometry>',
-            '      <material name="white">',
-            '        <color rgba="0.9 0.9 0.9 1.0"/>',
-            '      </material>',
-            '    </visual>',
-            '    <collision>',
-            '      <geometry>',
-            f'        <sphere radius="{dims["radius"]}"/>',
-            '      </geometry>',
-            '    </collision>',
-            '    <inertial>',
-            f'      <mass value="{mass}"/>',
-            f'      <inertia ixx="{self._sphere_inertia(mass, dims["radius"])}" '
-            f'ixy="0" ixz="0" '
-            f'iyy="{self._sphere_inertia(mass, dims["radius"])}" '
-            f'iyz="0" '
-            f'izz="{self._sphere_inertia(mass, dims["radius"])}"/>',
-            '    </inertial>',
-            '  </link>',
-            '',
-            '  <joint name="head_pitch" type="revolute">',
-            '    <parent link="torso"/>',
-            '    <child link="head"/>',
-            f'    <origin xyz="0 0 {torso_height/2 + dims["radius"]}" rpy="0 0 0"/>',
-            '    <axis xyz="0 1 0"/>',
-            f'    <limit lower="{math.radians(self.robot["joints"]["head_pitch"]["range"][0])}" '
-            f'upper="{math.radians(self.robot["joints"]["head_pitch"]["range"][1])}" '
-            f'effort="10" velocity="{math.radians(self.robot["joints"]["head_pitch"]["max_velocity"])}"/>',
-            '  </joint>',
-            ''
-        ])
+        i_sphere = self._sphere_inertia(mass, dims["radius"])
+        
+        self.urdf_lines.append('  <!-- 头部 -->')
+        self._add_link(
+            'head',
+            f'<sphere radius="{dims["radius"]}"/>',
+            _material('white', '0.9 0.9 0.9 1.0'),
+            mass,
+            (i_sphere, i_sphere, i_sphere),
+        )
+        self.urdf_lines.append('')
+        self._add_revolute_joint(
+            'head_pitch',
+            parent='torso',
+            child='head',
+            origin_xyz=f'0 0 {torso_height/2 + dims["radius"]}',
+            axis_xyz='0 1 0',
+            limit_joint='head_pitch',
+        )
         
     def _add_legs(self):
         """添加双腿"""
@@ -165,16 +204,22 @@ class URDFGenerator:
             side: 'left' 或 'right'
         """
         sign = 1 if side == 'left' else -1
-        torso_width = self.robot['link_dimensions']['torso']['width']
+        link_dims = self.robot['link_dimensions']
+        torso_width = link_dims['torso']['width']
         hip_offset = torso_width / 2 + 0.02  # 髋关节偏移
         
-        thigh_dims = self.robot['link_dimensions']['thigh']
-        calf_dims = self.robot['link_dimensions']['calf']
-        foot_dims = self.robot['link_dimensions']['foot']
+        thigh_dims = link_dims['thigh']
+        calf_dims = link_dims['calf']
+        foot_dims = link_dims['foot']
         
-        thigh_mass = self.robot['mass_distribution']['thigh']
-        calf_mass = self.robot['mass_distribution']['calf']
-        foot_mass = self.robot['mass_distribution']['foot']
+        masses = self.robot['mass_distribution']
+        thigh_mass = masses['thigh']
+        calf_mass = masses['calf']
+        foot_mass = masses['foot']
+        
+        # 转动惯量，每个 link 只计算一次
+        i_thigh = self._cylinder_inertia(thigh_mass, thigh_dims["radius"], thigh_dims["length"])
+        i_calf = self._cylinder_inertia(calf_mass, calf_dims["radius"], calf_dims["length"])
         
         # 髋关节roll（左右摆动）
         self.urdf_lines.extend([
@@ -186,138 +231,123 @@ class URDFGenerator:
             '    </inertial>',
             '  </link>',
             '',
-            f'  <joint name="{side}_hip_roll" type="revolute">',
-            '    <parent link="torso"/>',
-            f'    <child link="{side}_hip_roll_link"/>',
-            f'    <origin xyz="0 {sign * hip_offset} {-self.robot["link_dimensions"]["torso"]["height"]/2}" rpy="0 0 0"/>',
-            '    <axis xyz="1 0 0"/>',
-            f'    <limit lower="{math.radians(self.robot["joints"]["hip_roll"]["range"][0])}" '
-            f'upper="{math.radians(self.robot["joints"]["hip_roll"]["range"][1])}" '
-            f'effort="10" velocity="{math.radians(self.robot["joints"]["hip_roll"]["max_velocity"])}"/>',
-            '  </joint>',
-            ''
         ])
+        self._add_revolute_joint(
+            f'{side}_hip_roll',
+            parent='torso',
+            child=f'{side}_hip_roll_link',
+            origin_xyz=f'0 {sign * hip_offset} {-link_dims["torso"]["height"]/2}',
+            axis_xyz='1 0 0',
+            limit_joint='hip_roll',
+        )
         
         # 髋关节pitch（前后摆动）+ 大腿
-        self.urdf_lines.extend([
-            f'  <link name="{side}_thigh">',
-            '    <visual>',
-            '      <geometry>',
-            f'        <cylinder length="{thigh_dims["length"]}" radius="{thigh_dims["radius"]}"/>',
-            '      </geometry>',
-            f'      <origin xyz="0 0 {-thigh_dims["length"]/2}" rpy="0 0 0"/>',
-            '      <material name="gray">',
-            '        <color rgba="0.5 0.5 0.5 1.0"/>',
-            '      </material>',
-            '    </visual>',
-            '    <collision>',
-            '      <geometry>',
-            f'        <cylinder length="{thigh_dims["length"]}" radius="{thigh_dims["radius"]}"/>',
-            '      </geometry>',
-            f'      <origin xyz="0 0 {-thigh_dims["length"]/2}" rpy="0 0 0"/>',
-            '    </collision>',
-            '    <inertial>',
-            f'      <origin xyz="0 0 {-thigh_dims["length"]/2}" rpy="0 0 0"/>',
-            f'      <mass value="{thigh_mass}"/>',
-            f'      <inertia ixx="{self._cylinder_inertia(thigh_mass, thigh_dims["radius"], thigh_dims["length"])}" '
-            f'ixy="0" ixz="0" '
-            f'iyy="{self._cylinder_inertia(thigh_mass, thigh_dims["radius"], thigh_dims["length"])}" '
-            f'iyz="0" '
-            f'izz="{thigh_mass * thigh_dims["radius"]**2 / 2}"/>',
-            '    </inertial>',
-            '  </link>',
-            '',
-            f'  <joint name="{side}_hip_pitch" type="revolute">',
-            f'    <parent link="{side}_hip_roll_link"/>',
-            f'    <child link="{side}_thigh"/>',
-            '    <origin xyz="0 0 0" rpy="0 0 0"/>',
-            '    <axis xyz="0 1 0"/>',
-            f'    <limit lower="{math.radians(self.robot["joints"]["hip_pitch"]["range"][0])}" '
-            f'upper="{math.radians(self.robot["joints"]["hip_pitch"]["range"][1])}" '
-            f'effort="10" velocity="{math.radians(self.robot["joints"]["hip_pitch"]["max_velocity"])}"/>',
-            '  </joint>',
-            ''
-        ])
+        self._add_link(
+            f'{side}_thigh',
+            f'<cylinder length="{thigh_dims["length"]}" radius="{thigh_dims["radius"]}"/>',
+            _material('gray', '0.5 0.5 0.5 1.0'),
+            thigh_mass,
+            (i_thigh, i_thigh, thigh_mass * thigh_dims["radius"]**2 / 2),
+            origin_xyz=f'0 0 {-thigh_dims["length"]/2}',
+        )
+        self.urdf_lines.append('')
+        self._add_revolute_joint(
+            f'{side}_hip_pitch',
+            parent=f'{side}_hip_roll_link',
+            child=f'{side}_thigh',
+            origin_xyz='0 0 0',
+            axis_xyz='0 1 0',
+            limit_joint='hip_pitch',
+        )
         
         # 膝关节 + 小腿
-        self.urdf_lines.extend([
-            f'  <link name="{side}_calf">',
-            '    <visual>',
-            '      <geometry>',
-            f'        <cylinder length="{calf_dims["length"]}" radius="{calf_dims["radius"]}"/>',
-            '      </geometry>',
-            f'      <origin xyz="0 0 {-calf_dims["length"]/2}" rpy="0 0 0"/>',
-            '      <material name="gray"/>',
-            '    </visual>',
-            '    <collision>',
-            '      <geometry>',
-            f'        <cylinder length="{calf_dims["length"]}" radius="{calf_dims["radius"]}"/>',
-            '      </geometry>',
-            f'      <origin xyz="0 0 {-calf_dims["length"]/2}" rpy="0 0 0"/>',
-            '    </collision>',
-            '    <inertial>',
-            f'      <origin xyz="0 0 {-calf_dims["length"]/2}" rpy="0 0 0"/>',
-            f'      <mass value="{calf_mass}"/>',
-            f'      <inertia ixx="{self._cylinder_inertia(calf_mass, calf_dims["radius"], calf_dims["length"])}" '
-            f'ixy="0" ixz="0" '
-            f'iyy="{self._cylinder_inertia(calf_mass, calf_dims["radius"], calf_dims["length"])}" '
-            f'iyz="0" '
-            f'izz="{calf_mass * calf_dims["radius"]**2 / 2}"/>',
-            '    </inertial>',
-            '  </link>',
-            '',
-            f'  <joint name="{side}_knee" type="revolute">',
-            f'    <parent link="{side}_thigh"/>',
-            f'    <child link="{side}_calf"/>',
-            f'    <origin xyz="0 0 {-thigh_dims["length"]}" rpy="0 0 0"/>',
-            '    <axis xyz="0 1 0"/>',
-            f'    <limit lower="{math.radians(self.robot["joints"]["knee"]["range"][0])}" '
-            f'upper="{math.radians(self.robot["joints"]["knee"]["range"][1])}" '
-            f'effort="10" velocity="{math.radians(self.robot["joints"]["knee"]["max_velocity"])}"/>',
-            '  </joint>',
-            ''
-        ])
+        self._add_link(
+            f'{side}_calf',
+            f'<cylinder length="{calf_dims["length"]}" radius="{calf_dims["radius"]}"/>',
+            _material('gray'),
+            calf_mass,
+            (i_calf, i_calf, calf_mass * calf_dims["radius"]**2 / 2),
+            origin_xyz=f'0 0 {-calf_dims["length"]/2}',
+        )
+        self.urdf_lines.append('')
+        self._add_revolute_joint(
+            f'{side}_knee',
+            parent=f'{side}_thigh',
+            child=f'{side}_calf',
+            origin_xyz=f'0 0 {-thigh_dims["length"]}',
+            axis_xyz='0 1 0',
+            limit_joint='knee',
+        )
         
         # 踝关节 + 脚
-        self.urdf_lines.extend([
-            f'  <link name="{side}_foot">',
-            '    <visual>',
-            '      <geometry>',
-            f'        <box size="{foot_dims["length"]} {foot_dims["width"]} {foot_dims["height"]}"/>',
-            '      </geometry>',
-            f'      <origin xyz="{foot_dims["length"]/4} 0 {-foot_dims["height"]/2}" rpy="0 0 0"/>',
-            '      <material name="dark_gray">',
-            '        <color rgba="0.3 0.3 0.3 1.0"/>',
-            '      </material>',
-            '    </visual>',
-            '    <collision>',
-            '      <geometry>',
-            f'        <box size="{foot_dims["length"]} {foot_dims["width"]} {foot_dims["height"]}"/>',
-            '      </geometry>',
-            f'      <origin xyz="{foot_dims["length"]/4} 0 {-foot_dims["height"]/2}" rpy="0 0 0"/>',
-            '    </collision>',
-            '    <inertial>',
-            f'      <origin xyz="{foot_dims["length"]/4} 0 {-foot_dims["height"]/2}" rpy="0 0 0"/>',
-            f'      <mass value="{foot_mass}"/>',
-            f'      <inertia ixx="{self._box_inertia(foot_mass, foot_dims["width"], foot_dims["height"])}" '
-            f'ixy="0" ixz="0" '
-            f'iyy="{self._box_inertia(foot_mass, foot_dims["length"], foot_dims["height"])}" '
-            f'iyz="0" '
-            f'izz="{self._box_inertia(foot_mass, foot_dims["length"], foot_dims["width"])}"/>',
-            '    </inertial>',
-            '  </link>',
-            '',
-            f'  <joint name="{side}_ankle_pitch" type="revolute">',
-            f'    <parent link="{side}_calf"/>',
-            f'    <child link="{side}_foot"/>',
-            f'    <origin xyz="0 0 {-calf_dims["length"]}" rpy="0 0 0"/>',
-            '    <axis xyz="0 1 0"/>',
-            f'    <limit lower="{math.radians(self.robot["joints"]["ankle_pitch"]["range"][0])}" '
-            f'upper="{math.radians(self.robot["joints"]["ankle_pitch"]["range"][1])}" '
-            f'effort="10" velocity="{math.radians(self.robot["joints"]["ankle_pitch"]["max_velocity"])}"/>',
-            '  </joint>',
-            ''
-        ])
+        self._add_link(
+            f'{side}_foot',
+            f'<box size="{foot_dims["length"]} {foot_dims["width"]} {foot_dims["height"]}"/>',
+            _material('dark_gray', '0.3 0.3 0.3 1.0'),
+            foot_mass,
+            (self._box_inertia(foot_mass, foot_dims["width"], foot_dims["height"]),
+             self._box_inertia(foot_mass, foot_dims["length"], foot_dims["height"]),
+             self._box_inertia(foot_mass, foot_dims["length"], foot_dims["width"])),
+            origin_xyz=f'{foot_dims["length"]/4} 0 {-foot_dims["height"]/2}',
+        )
+        self.urdf_lines.append('')
+        self._add_revolute_joint(
+            f'{side}_ankle_pitch',
+            parent=f'{side}_calf',
+            child=f'{side}_foot',
+            origin_xyz=f'0 0 {-calf_dims["length"]}',
+            axis_xyz='0 1 0',
+            limit_joint='ankle_pitch',
+        )
+        
+    def _add_revolute_joint(self, name: str, parent: str, child: str,
+                            origin_xyz: str, axis_xyz: str, limit_joint: str):
+        """按 _JOINT_TEMPLATE 一次性生成转动关节
+        
+        Args:
+            name: 关节名称
+            parent: 父 link
+            child: 子 link
+            origin_xyz: 关节原点
+            axis_xyz: 转轴
+            limit_joint: 配置中对应的关节名（用于限位）
+        """
+        self.urdf_lines.append(_JOINT_TEMPLATE.format(
+            name=name, parent=parent, child=child, origin_xyz=origin_xyz,
+            axis_xyz=axis_xyz, limit=self._limit_tag(limit_joint),
+        ))
+        self.urdf_lines.append('')
+        
+    def _limit_tag(self, joint_name: str) -> str:
+        """生成关节的 <limit> 标签（范围与速度由度换算为弧度）
+        
+        Args:
+            joint_name: 配置中的关节名（如 'knee'）
+        """
+        joint = self.robot['joints'][joint_name]
+        lo, hi = joint['range']
+        return (f'    <limit lower="{math.radians(lo)}" upper="{math.radians(hi)}" '
+                f'effort="10" velocity="{math.radians(joint["max_velocity"])}"/>')
+        
+    def _add_link(self, name: str, geometry: str, material: str, mass: float,
+                  inertia: tuple, origin_xyz: str = None):
+        """按 _LINK_TEMPLATE 一次性生成带几何体的 link
+        
+        Args:
+            name: link 名称
+            geometry: 几何体标签（visual 与 collision 共用）
+            material: 材质片段（见 _material）
+            mass: 质量
+            inertia: (ixx, iyy, izz)
+            origin_xyz: visual/collision/inertial 共用的原点偏移（可选）
+        """
+        origin = (f'      <origin xyz="{origin_xyz}" rpy="0 0 0"/>\n'
+                  if origin_xyz is not None else '')
+        ixx, iyy, izz = inertia
+        self.urdf_lines.append(_LINK_TEMPLATE.format(
+            name=name, geometry=geometry, material=material, origin=origin,
+            mass=mass, ixx=ixx, iyy=iyy, izz=izz,
+        ))
         
     @staticmethod
     def _box_inertia(mass: float, width: float, height: float) -> float:
@@ -335,6 +365,11 @@ class URDFGenerator:
         return 2 * mass * radius**2 / 5
 
 
+def _generate_worker(config_path: str, output_path: str):
+    """generate_many 的进程池任务（需为模块级函数以便pickle）"""
+    URDFGenerator(config_path).generate(output_path)
+
+
 def main():
     """主函数"""
     # 获取配置文件路径
@@ -6,12 +6,63 @@ PyBullet仿真环境
 
 import pybullet as p
 import pybullet_data
+import sys
+import math
+import argparse
 import numpy as np
 import time
-import yaml
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 
+if not __package__:
+    # 直接以脚本运行时 (python src/simulation/environment.py) 加入项目根目录
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.utils.config import load_config
+
+# 标量角度换算系数（比逐个调用 np.deg2rad / np.rad2deg 省去 ufunc 开销）
+_DEG2RAD = math.pi / 180.0
+_RAD2DEG = 180.0 / math.pi
+
+
+class RatePacer:
+    """基于 perf_counter 的固定频率节拍器
+    
+    time.sleep 的精度在 Linux 上约 1-2ms、Windows 上约 15ms，直接 sleep(dt)
+    会累积超睡误差。这里按绝对截止时间推进：距截止时间较远时先 sleep，
+    最后 1ms 内忙等。
+    """
+    
+    def __init__(self, hz: float):
+        """初始化
+        
+        Args:
+            hz: 目标频率（Hz）
+        """
+        self.period = 1.0 / hz
+        self._next_t = None
+        
+    def reset(self):
+        """重置节拍（下一次 wait 重新以当前时刻为起点）"""
+        self._next_t = None
+        
+    def wait(self):
+        """等待到下一个节拍"""
+        now = time.perf_counter()
+        if self._next_t is None:
+            self._next_t = now
+        self._next_t += self.period
+        
+        slack = self._next_t - now
+        if slack < -self.period:
+            # 已落后超过一个周期，重新对齐，避免连续追赶
+            self._next_t = now
+            return
+        if slack > 0.002:
+            time.sleep(slack - 0.001)
+        while time.perf_counter() < self._next_t:
+            pass
+
 
 class SimulationEnvironment:
     """仿真环境管理器"""
@@ -24,13 +75,16 @@ class SimulationEnvironment:
             gui: 是否启用GUI
         """
         # 加载配置
-        with open(config_path, 'r', encoding='utf-8') as f:
-            self.config = yaml.safe_load(f)
+        self.config = load_config(str(config_path))
+        self._imu_noise_level = self.config['sensors']['imu']['noise_level']
+        self._rng = np.random.default_rng()  # IMU噪声发生器
         
         self.gui = gui
         self.robot_id = None
         self.joint_indices = {}
         self.joint_names = []
+        self.joint_limits = {}   # 关节名称->(下限, 上限)（弧度）
+        self._pacer = None
         
         # 连接物理引擎
         if gui:
@@ -52,6 +106,12 @@ class SimulationEnvironment:
         time_step = self.config['simulation']['physics']['time_step']
         p.setTimeStep(time_step)
         
+        # 约束求解器迭代次数：场景只有足底-地面接触，按配置设定
+        # （此前配置项未生效，沿用的是Bullet默认值）
+        solver_iterations = self.config['simulation']['physics'].get('solver_iterations')
+        if solver_iterations is not None:
+            p.setPhysicsEngineParameter(numSolverIterations=int(solver_iterations))
+        
         # 加载地面
         p.setAdditionalSearchPath(pybullet_data.getDataPath())
         plane_id = p.loadURDF("plane.urdf")
@@ -112,34 +172,65 @@ class SimulationEnvironment:
             if joint_type == p.JOINT_REVOLUTE:
                 self.joint_indices[joint_name] = i
                 self.joint_names.append(joint_name)
+                self.joint_limits[joint_name] = (joint_info[8], joint_info[9])
+        
+        # 与 joint_names 对齐的索引列表，供批量读写接口使用
+        self._joint_idx_list = [self.joint_indices[n] for n in self.joint_names]
+        
+        # get_joint_state_arrays 复用的输出缓冲区
+        n = len(self.joint_names)
+        self._pos_buf = np.empty(n)
+        self._vel_buf = np.empty(n)
+        self._tau_buf = np.empty(n)
                 
     def _set_initial_pose(self):
         """设置初始姿态并启用关节电机
         
-        注意: resetJointState 只设置初始状态，不会施加力。
+        注意: 重置关节状态只设置初始状态，不会施加力。
         必须同时调用 setJointMotorControl2 启用位置控制，
         否则关节在重力下会自由塌陷。
         """
         joint_angles = self.config['initial_pose']['joint_angles']
         
+        indices = []
+        angles = []
         for joint_name, angle_deg in joint_angles.items():
-            if joint_name in self.joint_indices:
-                joint_idx = self.joint_indices[joint_name]
-                angle_rad = np.deg2rad(angle_deg)
-                
-                # 1. 设置初始关节状态（位置+零速度）
-                p.resetJointState(self.robot_id, joint_idx, angle_rad)
-                
-                # 2. 立即启用位置控制电机，防止关节自由塌陷
-                p.setJointMotorControl2(
-                    self.robot_id,
-                    joint_idx,
-                    p.POSITION_CONTROL,
-                    targetPosition=angle_rad,
-                    force=10,  # 与URDF中effort一致
-                    maxVelocity=2.0
-                )
+            joint_idx = self.joint_indices.get(joint_name)
+            if joint_idx is not None:
+                indices.append(joint_idx)
+                angles.append(angle_deg * _DEG2RAD)
+        
+        # 1. 设置初始关节状态（位置+零速度），一次调用完成
+        p.resetJointStatesMultiDof(self.robot_id, indices,
+                                   targetValues=[[a] for a in angles],
+                                   targetVelocities=[[0.0] for _ in angles])
+        
+        # 2. 立即启用位置控制电机，防止关节自由塌陷
+        #    这里逐关节调用 setJointMotorControl2 以设定 maxVelocity，
+        #    该值会保留在电机上（setJointMotorControlArray 无此参数）
+        for joint_idx, angle_rad in zip(indices, angles):
+            p.setJointMotorControl2(
+                self.robot_id,
+                joint_idx,
+                p.POSITION_CONTROL,
+                targetPosition=angle_rad,
+                force=10,  # 与URDF中effort一致
+                maxVelocity=2.0
+            )
                 
+    def reset_robot_state(self):
+        """将已加载的机器人恢复到初始位姿
+        
+        复用已加载的模型，只重置基座位姿/速度和关节状态，
+        比重新创建环境并加载URDF快得多。
+        """
+        init_pos = self.config['initial_pose']['position']
+        init_orn = self.config['initial_pose']['orientation']
+        
+        p.resetBasePositionAndOrientation(self.robot_id, init_pos, init_orn)
+        p.resetBaseVelocity(self.robot_id, [0, 0, 0], [0, 0, 0])
+        self._set_initial_pose()
+        
     def set_joint_positions(self, joint_positions: Dict[str, float],
                            force: float = 10.0):
         """设置关节位置（位置控制）
@@ -148,19 +239,48 @@ class SimulationEnvironment:
             joint_positions: 关节名称->角度（度）的字典
             force: 最大力矩（N·m），默认10与URDF effort一致
         """
+        joint_indices = self.joint_indices
+        indices = []
+        targets = []
         for joint_name, angle_deg in joint_positions.items():
-            if joint_name in self.joint_indices:
-                joint_idx = self.joint_indices[joint_name]
-                angle_rad = np.deg2rad(angle_deg)
-                p.setJointMotorControl2(
-                    self.robot_id,
-                    joint_idx,
-                    p.POSITION_CONTROL,
-                    targetPosition=angle_rad,
-                    force=force,
-                    maxVelocity=2.0
-                )
-                
+            joint_idx = joint_indices.get(joint_name)
+            if joint_idx is not None:
+                indices.append(joint_idx)
+                targets.append(angle_deg * _DEG2RAD)
+        
+        if not indices:
+            return
+        
+        # 一次调用下发所有关节目标
+        # maxVelocity=2.0 已在 _set_initial_pose 中设置到电机上
+        p.setJointMotorControlArray(
+            self.robot_id,
+            indices,
+            p.POSITION_CONTROL,
+            targetPositions=targets,
+            forces=[force] * len(indices)
+        )
+        
+    def set_joint_positions_array(self, angles_deg, force: float = 10.0):
+        """按 joint_names 顺序设置全部关节位置（位置控制）
+        
+        与 set_joint_positions 等价，但目标角度按 self.joint_names 的顺序给出，
+        省去逐关节的名称查找，适合在控制循环中复用同一个数组。
+        
+        Args:
+            angles_deg: 与 joint_names 对齐的目标角度数组（度）
+            force: 最大力矩（N·m），默认10与URDF effort一致
+        """
+        # 转为list再传入：pybullet 解析list比解析ndarray快
+        targets = (np.asarray(angles_deg, dtype=float) * _DEG2RAD).tolist()
+        p.setJointMotorControlArray(
+            self.robot_id,
+            self._joint_idx_list,
+            p.POSITION_CONTROL,
+            targetPositions=targets,
+            forces=[force] * len(targets)
+        )
+        
     def get_joint_states(self) -> Dict[str, Dict[str, float]]:
         """获取所有关节状态
         
@@ -168,18 +288,38 @@ class SimulationEnvironment:
             关节名称->状态字典的字典
             状态包含: position, velocity, torque
         """
-        states = {}
+        joint_states = p.getJointStates(self.robot_id, self._joint_idx_list)
         
-        for joint_name, joint_idx in self.joint_indices.items():
-            joint_state = p.getJointState(self.robot_id, joint_idx)
+        states = {}
+        for joint_name, joint_state in zip(self.joint_names, joint_states):
             states[joint_name] = {
-                'position': np.rad2deg(joint_state[0]),  # 转为度
-                'velocity': np.rad2deg(joint_state[1]),
+                'position': joint_state[0] * _RAD2DEG,  # 转为度
+                'velocity': joint_state[1] * _RAD2DEG,
                 'torque': joint_state[3]
             }
             
         return states
         
+    def get_joint_state_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """以数组形式获取所有关节状态（顺序与 joint_names 一致）
+        
+        返回的数组由环境持有，下一次调用时会被覆盖，需保留请自行 copy。
+        
+        Returns:
+            (位置(度), 速度(度/秒), 力矩(N·m))
+        """
+        joint_states = p.getJointStates(self.robot_id, self._joint_idx_list)
+        positions, velocities, _, torques = zip(*joint_states)
+        
+        pos, vel, tau = self._pos_buf, self._vel_buf, self._tau_buf
+        pos[:] = positions
+        vel[:] = velocities
+        tau[:] = torques
+        np.multiply(pos, _RAD2DEG, out=pos)  # 转为度
+        np.multiply(vel, _RAD2DEG, out=vel)
+        
+        return pos, vel, tau
+        
     def get_base_state(self) -> Dict[str, np.ndarray]:
         """获取基座（躯干）状态
         
@@ -200,34 +340,86 @@ class SimulationEnvironment:
             'angular_velocity': np.array(ang_vel)
         }
         
+    def get_base_state_into(self, out: np.ndarray) -> np.ndarray:
+        """把基座位置和欧拉角写入预分配数组（控制循环用）
+        
+        不构造字典；默认只读取位姿，out 长度≥9 时再读取线速度。
+        
+        Args:
+            out: 长度≥6的数组，写入 [x, y, z, roll, pitch, yaw]
+                 （位置单位米，角度单位度）；长度≥9 时 out[6:9]
+                 写入线速度 [vx, vy, vz]（米/秒）
+        
+        Returns:
+            out
+        """
+        pos, orn = p.getBasePositionAndOrientation(self.robot_id)
+        roll, pitch, yaw = p.getEulerFromQuaternion(orn)
+        out[0:3] = pos
+        out[3] = roll * _RAD2DEG
+        out[4] = pitch * _RAD2DEG
+        out[5] = yaw * _RAD2DEG
+        if len(out) >= 9:
+            out[6:9] = p.getBaseVelocity(self.robot_id)[0]
+        return out
+
     def get_imu_data(self) -> Dict[str, np.ndarray]:
         """模拟IMU数据
         
         Returns:
             包含加速度和角速度的字典
         """
-        base_state = self.get_base_state()
+        # 只取IMU用得到的姿态和角速度，不经过 get_base_state 构造完整状态
+        _, orn = p.getBasePositionAndOrientation(self.robot_id)
+        _, base_ang_vel = p.getBaseVelocity(self.robot_id)
+        euler = np.rad2deg(np.array(p.getEulerFromQuaternion(orn)))
         
-        # 添加噪声
-        noise_level = self.config['sensors']['imu']['noise_level']
+        # 添加噪声：一次采样6个值，前3个给加速度、后3个给角速度
+        noise = self._rng.normal(0, self._imu_noise_level, 6)
         
         # 线性加速度（包含重力）
-        lin_acc = np.random.normal(0, noise_level, 3)
+        lin_acc = noise[:3]
         lin_acc[2] += 9.81  # Z轴重力
         
         # 角速度
-        ang_vel = base_state['angular_velocity'] + np.random.normal(0, noise_level, 3)
+        ang_vel = np.add(base_ang_vel, noise[3:])
         
         return {
             'linear_acceleration': lin_acc,
             'angular_velocity': ang_vel,
-            'orientation': base_state['orientation_euler']
+            'orientation': euler
         }
         
     def step(self):
         """执行一步仿真"""
         p.stepSimulation()
         
+    def step_rt(self):
+        """执行一步仿真，并按物理时间步长进行实时节拍"""
+        if self._pacer is None:
+            time_step = self.config['simulation']['physics']['time_step']
+            self._pacer = RatePacer(1.0 / time_step)
+        p.stepSimulation()
+        self._pacer.wait()
+        
+    def run_steps(self, num_steps: int,
+                  joint_positions: Optional[Dict[str, float]] = None):
+        """发送一次关节目标后连续执行多步仿真
+        
+        位置控制目标在 PyBullet 中是持续有效的，中间步无需重复下发，
+        也不做任何 sleep，适合不需要逐步读取状态的场景。
+        
+        Args:
+            num_steps: 仿真步数
+            joint_positions: 关节名称->角度（度）的字典（可选）
+        """
+        if joint_positions:
+            self.set_joint_positions(joint_positions)
+        
+        step_simulation = p.stepSimulation
+        for _ in range(num_steps):
+            step_simulation()
+        
     def run(self, duration: float = 10.0, real_time: bool = True):
         """运行仿真
         
@@ -240,14 +432,14 @@ class SimulationEnvironment:
         
         print(f"🚀 开始仿真 (时长={duration}s, 步数={steps})")
         
+        step = self.step_rt if real_time else self.step
+        print_every = max(1, int(1.0 / time_step))  # 每秒打印一次（步长>1s时每步打印）
+        
         for i in range(steps):
-            self.step()
-            
-            if real_time:
-                time.sleep(time_step)
+            step()
                 
             # 每秒打印一次状态
-            if i % int(1.0 / time_step) == 0:
+            if i % print_every == 0:
                 base_state = self.get_base_state()
                 print(f"   t={i*time_step:.2f}s | "
                       f"pos={base_state['position']} | "
@@ -266,11 +458,7 @@ class SimulationEnvironment:
             
         params = {}
         
-        for joint_name, joint_idx in self.joint_indices.items():
-            joint_info = p.getJointInfo(self.robot_id, joint_idx)
-            lower_limit = joint_info[8]
-            upper_limit = joint_info[9]
-            
+        for joint_name, (lower_limit, upper_limit) in self.joint_limits.items():
             # 如果没有限制，设置默认范围
             if lower_limit >= upper_limit:
                 lower_limit = -np.pi
@@ -299,20 +487,29 @@ class SimulationEnvironment:
         Returns:
             关节名称->角度（弧度）的字典
         """
-        values = {}
+        return dict(zip(params, self.read_debug_parameter_values(params.values())))
+        
+    def read_debug_parameter_values(self, param_ids: List[int]) -> List[float]:
+        """按给定顺序读取调试滑块值（控制循环用）
         
+        不构造字典：调用方预先缓存滑块ID列表，每帧一次遍历得到数值列表，
+        可直接传给 setJointMotorControlArray。
+        
+        Args:
+            param_ids: 参数ID列表
+            
+        Returns:
+            与 param_ids 对齐的数值列表；断开连接时返回空列表
+        """
         # 检查连接状态
         if not p.isConnected():
-            return values
+            return []
         
         try:
-            for joint_name, param_id in params.items():
-                values[joint_name] = p.readUserDebugParameter(param_id)
-        except:
-            # 如果读取失败（可能是断开连接），返回空字典
-            return {}
-            
-        return values
+            return list(map(p.readUserDebugParameter, param_ids))
+        except p.error:
+            # 如果读取失败（可能是断开连接），返回空列表
+            return []
         
     def close(self):
         """关闭仿真"""
@@ -320,8 +517,12 @@ class SimulationEnvironment:
         print("✅ 仿真已关闭")
 
 
-def main():
-    """主函数：测试仿真环境"""
+def main(no_sleep: bool = False):
+    """主函数：测试仿真环境
+    
+    Args:
+        no_sleep: 不做实时节拍，尽可能快地运行仿真
+    """
     # 文件路径
     base_path = Path(__file__).parent.parent.parent
     config_path = base_path / 'config' / 'robot_config.yaml'
@@ -339,21 +540,30 @@ def main():
     print("   - 拖动滑块实时调整机器人姿态")
     print("   - 关闭GUI窗口或按Ctrl+C退出\n")
     
+    pacer = RatePacer(240)  # 240Hz
+    
+    # 240Hz 循环内用到的方法预先绑定为局部变量
+    read_params = env.read_debug_parameters
+    set_positions = env.set_joint_positions
+    step = env.step
+    wait = pacer.wait
+    
     try:
         while True:
             # 读取滑块值并应用
-            joint_values = env.read_debug_parameters(debug_params)
+            joint_values = read_params(debug_params)
             
             # 转换为位置控制命令
             joint_positions = {}
             for joint_name, angle_rad in joint_values.items():
-                joint_positions[joint_name] = np.rad2deg(angle_rad)
+                joint_positions[joint_name] = angle_rad * _RAD2DEG
                 
-            env.set_joint_positions(joint_positions)
+            set_positions(joint_positions)
             
             # 执行仿真步
-            env.step()
-            time.sleep(1/240)  # 240Hz
+            step()
+            if not no_sleep:
+                wait()
             
     except KeyboardInterrupt:
         print("\n⏹️ 用户手动停止仿真")
@@ -368,4 +578,7 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--no-sleep', action='store_true')
+    args = ap.parse_args()
+    main(no_sleep=args.no_sleep)
@@ -0,0 +1,31 @@
+"""
+配置文件加载
+
+YAML 解析较慢，同一路径的配置在进程内只解析一次
+"""
+
+import yaml
+from functools import lru_cache
+from typing import Dict
+
+try:
+    # libyaml 的 C 实现，比纯 Python 解析器快约一个数量级
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
+
+@lru_cache(maxsize=4)
+def load_config(path: str) -> Dict:
+    """加载YAML配置（按路径缓存）
+    
+    返回的字典在多个调用方之间共享，视为只读，不要原地修改。
+    
+    Args:
+        path: 配置文件路径
+        
+    Returns:
+        配置字典
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.load(f, Loader=_SafeLoader)
@@ -4,25 +4,82 @@
 用于量化评估机器人的站立和行走稳定性
 """
 
+import math
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+
+# 历史缓冲区初始容量（样本数），写满后按2倍扩容
+_INITIAL_CAPACITY = 4096
+
+# 默认历史窗口长度（样本数），1kHz 下约1分钟
+_DEFAULT_BUFFER_CAPACITY = 60_000
+
+_BUFFER_NAMES = ('_time', '_height', '_roll', '_pitch', '_yaw',
+                 '_velocity', '_position', '_torques')
+
+
+def _is_stable_kernel(height: float, roll: float, pitch: float,
+                      dx: float, dy: float,
+                      min_height: float, max_roll: float, max_pitch: float,
+                      max_drift: float) -> bool:
+    """稳定性判定核心（纯标量）
+
+    每个仿真步都可能调用：只做标量比较，不经过 numpy。
+
+    Args:
+        height, roll, pitch: 最新样本的高度与姿态角（度）
+        dx, dy: 相对起始位置的水平漂移
+        其余: 对应阈值
+    """
+    if height < min_height:
+        return False
+    if abs(roll) > max_roll or abs(pitch) > max_pitch:
+        return False
+    # 比较平方距离，省去开方
+    if dx * dx + dy * dy > max_drift * max_drift:
+        return False
+    return True
 
 
 class StabilityMetrics:
-    """稳定性指标计算器"""
+    """稳定性指标计算器
     
-    def __init__(self):
-        """初始化"""
-        self.history = {
-            'time': [],
-            'height': [],
-            'roll': [],
-            'pitch': [],
-            'yaw': [],
-            'position': [],
-            'velocity': [],
-            'joint_torques': []
-        }
+    历史数据存放在预分配的 NumPy 数组中（按需2倍扩容），
+    各统计量直接在数组视图上计算，不再逐次把列表转换为数组。
+    
+    history 只保留最近 buffer_capacity 个样本，更早的样本在丢弃前
+    已并入在线累加器，因此评分/摘要仍覆盖整个运行过程。
+    """
+    
+    def __init__(self, buffer_capacity: Optional[int] = _DEFAULT_BUFFER_CAPACITY):
+        """初始化
+        
+        Args:
+            buffer_capacity: 历史窗口长度（样本数），None 表示不限制
+        """
+        if buffer_capacity is not None and buffer_capacity < 1:
+            raise ValueError(f"buffer_capacity 必须为正整数: {buffer_capacity}")
+        self.buffer_capacity = buffer_capacity
+        
+        self._capacity = _INITIAL_CAPACITY
+        if buffer_capacity is not None:
+            # 缓冲区最多存放两个窗口，写满时整体前移一次（均摊 O(1)）
+            self._capacity = min(_INITIAL_CAPACITY, 2 * buffer_capacity)
+        self._n = 0            # 已记录的样本数
+        self._n_torques = 0    # 已记录的关节力矩样本数（仅在提供时记录）
+        self._offset = 0           # 已从缓冲区丢弃的样本数
+        self._torque_offset = 0    # 已从缓冲区丢弃的力矩样本数
+        
+        self._time = np.empty(self._capacity)
+        self._height = np.empty(self._capacity)
+        # 姿态角统一以度为单位写入；阈值为几十度量级，float32 精度足够且内存减半
+        self._roll = np.empty(self._capacity, dtype=np.float32)
+        self._pitch = np.empty(self._capacity, dtype=np.float32)
+        self._yaw = np.empty(self._capacity, dtype=np.float32)
+        self._velocity = np.empty(self._capacity)
+        self._position = np.empty((self._capacity, 3))
+        self._torques = np.empty(self._capacity)
         
         # 稳定性阈值
         self.thresholds = {
@@ -35,6 +92,110 @@ class StabilityMetrics:
         self.start_position = None
         self.current_time = 0
         
+        # 在线统计累加器（见 _fold_new_samples），只覆盖前 _acc_n 个样本
+        # height/roll/pitch/x/y 五个序列的均值与离差平方和 (Welford / Chan 合并)
+        self._acc_n = 0
+        self._acc_mean = np.zeros(5)
+        self._acc_m2 = np.zeros(5)
+        self._acc_abs_sum = np.zeros(2)    # |roll|, |pitch| 之和
+        self._acc_abs_max = np.zeros(2)    # |roll|, |pitch| 最大值
+        self._acc_height_min = np.inf
+        self._acc_height_max = -np.inf
+        self._acc_n_torques = 0
+        self._acc_torque_sum = 0.0
+        
+        # _stats() 的缓存，按 (样本数, 力矩样本数) 失效
+        self._stats_key = None
+        self._stats_cache = None
+        
+    @property
+    def history(self) -> Dict[str, np.ndarray]:
+        """历史数据（最近 buffer_capacity 个样本的数组视图，position 为 (N, 3)）"""
+        end = self._n - self._offset
+        t_end = self._n_torques - self._torque_offset
+        start = t_start = 0
+        if self.buffer_capacity is not None:
+            start = max(0, end - self.buffer_capacity)
+            t_start = max(0, t_end - self.buffer_capacity)
+        return {
+            'time': self._time[start:end],
+            'height': self._height[start:end],
+            'roll': self._roll[start:end],
+            'pitch': self._pitch[start:end],
+            'yaw': self._yaw[start:end],
+            'position': self._position[start:end],
+            'velocity': self._velocity[start:end],
+            'joint_torques': self._torques[t_start:t_end]
+        }
+    
+    @property
+    def history_full(self) -> bool:
+        """历史窗口是否已写满（history 不再包含最早的样本）"""
+        return self.buffer_capacity is not None and self._n > self.buffer_capacity
+        
+    def _ensure_capacity(self, required: int):
+        """保证缓冲区至少能容纳 required 个样本，不足时按2倍扩容"""
+        if required <= self._capacity:
+            return
+        
+        capacity = self._capacity
+        while capacity < required:
+            capacity *= 2
+        if self.buffer_capacity is not None:
+            capacity = min(capacity, 2 * self.buffer_capacity)
+        
+        for name in _BUFFER_NAMES:
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        
+        self._capacity = capacity
+    
+    def _reserve(self, count: int, torques: bool = False) -> int:
+        """为 count 个新样本预留空间（count 不超过 buffer_capacity）
+        
+        Returns:
+            缓冲区内的写入起始下标
+        """
+        if torques:
+            start = self._n_torques - self._torque_offset
+        else:
+            start = self._n - self._offset
+        
+        if start + count > self._capacity:
+            if (self.buffer_capacity is not None
+                    and start + count > 2 * self.buffer_capacity):
+                self._drop_old_samples()
+                return self._reserve(count, torques)
+            self._ensure_capacity(start + count)
+        return start
+    
+    def _drop_old_samples(self):
+        """把全部样本并入累加器后，只在缓冲区保留最近 buffer_capacity 个"""
+        self._fold_new_samples()
+        keep = self.buffer_capacity
+        
+        stored = self._n - self._offset
+        if stored > keep:
+            drop = stored - keep
+            for name in _BUFFER_NAMES[:-1]:
+                buf = getattr(self, name)
+                buf[:keep] = buf[drop:stored]
+            self._offset += drop
+        
+        stored = self._n_torques - self._torque_offset
+        if stored > keep:
+            drop = stored - keep
+            self._torques[:keep] = self._torques[drop:stored]
+            self._torque_offset += drop
+        
+    def _append_torque(self, total_torque: float):
+        """记录一个关节力矩样本"""
+        i = self._reserve(1, torques=True)
+        self._torques[i] = total_torque
+        self._n_torques += 1
+        
     def update(self, base_state: Dict, joint_states: Dict = None, imu_data: Dict = None):
         """更新数据
         
@@ -44,26 +205,127 @@ class StabilityMetrics:
             imu_data: IMU数据（可选）
         """
         pos = base_state['position']
-        euler = base_state['orientation_euler']
-        vel = base_state['linear_velocity']
+        vx, vy, vz = base_state['linear_velocity'].tolist()
+        speed = math.sqrt(vx * vx + vy * vy + vz * vz)
+        
+        # 关节数很少，直接对字典求和比先转成数组更快；
+        # 显式循环 + 局部绑定 abs 比生成器表达式约快三分之一
+        total_torque = None
+        if joint_states:
+            _abs = abs
+            total_torque = 0.0
+            for js in joint_states.values():
+                total_torque += _abs(js['torque'])
+        
+        self._append_sample(pos, base_state['orientation_euler'], speed, total_torque)
+        self.current_time += 0.001  # 假设1ms更新
+    
+    def update_from_arrays(self, position: np.ndarray, euler: np.ndarray, speed: float = 0.0,
+                           joint_torques: np.ndarray = None, dt: float = 0.001):
+        """以数组形式更新数据（结构化数组布局）
         
+        配合 env.get_joint_state_arrays() 使用，无需构造逐关节的字典。
+        
+        Args:
+            position: 基座位置 [x, y, z]
+            euler: 基座姿态 [roll, pitch, yaw] (度)
+            speed: 基座线速度模长
+            joint_torques: 关节力矩数组（可选）
+            dt: 采样间隔 (秒)
+        """
+        total_torque = None
+        if joint_torques is not None and len(joint_torques):
+            total_torque = float(np.abs(joint_torques).sum())
+        
+        self._append_sample(position, euler, speed, total_torque)
+        self.current_time += dt
+    
+    def _append_sample(self, pos, euler, speed, total_torque):
+        """写入单个采样"""
         if self.start_position is None:
-            self.start_position = pos.copy()
+            self.start_position = np.array(pos, dtype=float)
+        
+        i = self._reserve(1)
+        self._time[i] = self.current_time
+        self._height[i] = pos[2]
+        self._roll[i] = euler[0]
+        self._pitch[i] = euler[1]
+        self._yaw[i] = euler[2]
+        self._position[i] = pos
+        self._velocity[i] = speed
+        self._n += 1
+        
+        if total_torque is not None:
+            self._append_torque(total_torque)
+    
+    def update_batch(self, positions: np.ndarray, eulers: np.ndarray,
+                     velocities: np.ndarray, joint_torques: np.ndarray = None,
+                     dt: float = 0.001):
+        """批量更新数据（一次性写入N个采样）
         
-        self.history['time'].append(self.current_time)
-        self.history['height'].append(pos[2])
-        self.history['roll'].append(euler[0])
-        self.history['pitch'].append(euler[1])
-        self.history['yaw'].append(euler[2])
-        self.history['position'].append(pos.copy())
-        self.history['velocity'].append(np.linalg.norm(vel))
+        Args:
+            positions: 位置 (N, 3)
+            eulers: 姿态欧拉角 (N, 3) (度)
+            velocities: 线速度 (N, 3)
+            joint_torques: 每个采样的关节力矩绝对值之和 (N,)（可选）
+            dt: 采样间隔（秒）
+        """
+        self._append_batch(positions, eulers,
+                           np.linalg.norm(velocities, axis=1), joint_torques, dt)
+    
+    def add_measurements_bulk(self, positions: np.ndarray, orientations: np.ndarray,
+                              velocities: np.ndarray = None,
+                              joint_torques: np.ndarray = None, dt: float = 0.01):
+        """批量添加测量数据（add_measurement 的批量版本，如回放记录的轨迹）
         
-        # 记录关节力矩（如果提供）
-        if joint_states:
-            total_torque = sum(abs(js['torque']) for js in joint_states.values())
-            self.history['joint_torques'].append(total_torque)
+        Args:
+            positions: 位置 (N, 3)
+            orientations: 姿态 [roll, pitch, yaw] (N, 3) (度)
+            velocities: 速度大小 (N,)（可选，默认为0）
+            joint_torques: 每个采样的关节力矩绝对值之和 (N,)（可选）
+            dt: 采样间隔（秒）
+        """
+        if velocities is None:
+            velocities = np.zeros(len(positions))
+        self._append_batch(positions, orientations, velocities, joint_torques, dt)
+    
+    def _append_batch(self, positions: np.ndarray, eulers: np.ndarray,
+                      speeds: np.ndarray, joint_torques: np.ndarray, dt: float):
+        """把N个样本整块写入缓冲区（统计量在下次 _stats() 时一次性合并）"""
+        positions = np.asarray(positions, dtype=float)
+        eulers = np.asarray(eulers, dtype=float)
+        count = len(positions)
+        if count == 0:
+            return
         
-        self.current_time += 0.001  # 假设1ms更新
+        if self.start_position is None:
+            self.start_position = positions[0].copy()
+        
+        speeds = np.broadcast_to(np.asarray(speeds, dtype=float), (count,))
+        if joint_torques is not None:
+            joint_torques = np.asarray(joint_torques, dtype=float)
+        
+        # 有窗口限制时按窗口长度分块写入，每块写入前旧样本已并入累加器
+        chunk = self.buffer_capacity or count
+        for s in range(0, count, chunk):
+            e = min(s + chunk, count)
+            m = e - s
+            i = self._reserve(m)
+            self._time[i:i + m] = self.current_time + np.arange(m) * dt
+            self._height[i:i + m] = positions[s:e, 2]
+            self._roll[i:i + m] = eulers[s:e, 0]
+            self._pitch[i:i + m] = eulers[s:e, 1]
+            self._yaw[i:i + m] = eulers[s:e, 2]
+            self._position[i:i + m] = positions[s:e]
+            self._velocity[i:i + m] = speeds[s:e]
+            self._n += m
+            
+            if joint_torques is not None:
+                j = self._reserve(m, torques=True)
+                self._torques[j:j + m] = joint_torques[s:e]
+                self._n_torques += m
+            
+            self.current_time += m * dt
     
     def add_measurement(self, position: np.ndarray, orientation: np.ndarray, joint_torques: List = None):
         """添加测量数据（兼容接口）
@@ -73,29 +335,96 @@ class StabilityMetrics:
             orientation: 姿态 [roll, pitch, yaw] (度)
             joint_torques: 关节力矩列表（可选）
         """
-        if self.start_position is None:
-            self.start_position = position.copy()
-        
-        self.history['time'].append(self.current_time)
-        self.history['height'].append(position[2])
-        self.history['roll'].append(orientation[0])
-        self.history['pitch'].append(orientation[1])
-        self.history['yaw'].append(orientation[2])
-        self.history['position'].append(position.copy())
-        self.history['velocity'].append(0.0)  # 未提供速度信息
-        
+        total_torque = None
         if joint_torques:
-            self.history['joint_torques'].append(sum(abs(t) for t in joint_torques))
+            _abs = abs
+            total_torque = 0.0
+            for t in joint_torques:
+                total_torque += _abs(t)
         
+        self._append_sample(position, orientation, 0.0, total_torque)  # 未提供速度信息
         self.current_time += 0.01  # 假设10ms更新
     
+    def _fold_new_samples(self):
+        """把上次统计之后新增的样本并入在线累加器
+        
+        新样本段先整体求均值与离差平方和，再用 Chan 并行合并公式并入，
+        数值上与 Welford 逐点更新等价；每个样本只被统计一次，
+        因此整个运行过程中反复调用评分/摘要的总开销为 O(N)。
+        """
+        c, n = self._acc_n, self._n
+        if n > c:
+            lo, hi = c - self._offset, n - self._offset   # 缓冲区内下标
+            seg = np.stack((self._height[lo:hi], self._roll[lo:hi], self._pitch[lo:hi],
+                            self._position[lo:hi, 0], self._position[lo:hi, 1]))
+            m = n - c
+            seg_mean = seg.mean(axis=1)
+            seg_m2 = ((seg - seg_mean[:, None]) ** 2).sum(axis=1)
+            
+            delta = seg_mean - self._acc_mean
+            self._acc_mean = self._acc_mean + delta * (m / n)
+            self._acc_m2 = self._acc_m2 + seg_m2 + delta * delta * (c * m / n)
+            
+            abs_rp = np.abs(seg[1:3])
+            self._acc_abs_sum = self._acc_abs_sum + abs_rp.sum(axis=1)
+            self._acc_abs_max = np.maximum(self._acc_abs_max, abs_rp.max(axis=1))
+            self._acc_height_min = min(self._acc_height_min, seg[0].min())
+            self._acc_height_max = max(self._acc_height_max, seg[0].max())
+            self._acc_n = n
+        
+        c, n = self._acc_n_torques, self._n_torques
+        if n > c:
+            off = self._torque_offset
+            self._acc_torque_sum += self._torques[c - off:n - off].sum()
+            self._acc_n_torques = n
+        
+    def _stats(self) -> Dict:
+        """计算各评分/摘要共用的统计量（需至少1个样本）
+        
+        基于在线累加器，只处理新增样本；结果按当前样本数缓存，
+        同一时刻多次调用评分/摘要不会重复计算。
+        """
+        key = (self._n, self._n_torques)
+        if key == self._stats_key:
+            return self._stats_cache
+        
+        self._fold_new_samples()
+        n = self._n
+        means = self._acc_mean
+        stds = np.sqrt(self._acc_m2 / n)   # 总体标准差，与 np.std 一致
+        abs_means = self._acc_abs_sum / n
+        
+        stats = {
+            'height_mean': means[0],
+            'height_std': stds[0],
+            'height_min': self._acc_height_min,
+            'height_max': self._acc_height_max,
+            'roll_std': stds[1],
+            'pitch_std': stds[2],
+            'abs_roll_mean': abs_means[0],
+            'abs_roll_max': self._acc_abs_max[0],
+            'abs_pitch_mean': abs_means[1],
+            'abs_pitch_max': self._acc_abs_max[1],
+            'position_drift': np.linalg.norm(self._position[n - 1 - self._offset, :2]
+                                             - self.start_position[:2]),
+            # 水平位置标准差 (x, y)，仅在多于1个样本时有意义
+            'position_xy_std': stds[3:5] if n > 1 else None,
+            'torque_mean': (self._acc_torque_sum / self._n_torques
+                            if self._n_torques > 0 else None),
+        }
+        
+        self._stats_key = key
+        self._stats_cache = stats
+        return stats
+        
     def calculate_scores(self) -> Dict:
         """计算详细评分
         
         Returns:
             包含各项评分的字典
         """
-        if len(self.history['height']) == 0:
+        n = self._n
+        if n == 0:
             return {
                 'total_score': 0.0,
                 'position_score': 0.0,
@@ -103,10 +432,11 @@ class StabilityMetrics:
                 'energy_score': 0.0
             }
         
+        stats = self._stats()
+        
         # 位置稳定性评分 (35分)
-        height_std = np.std(self.history['height'])
-        positions = np.array(self.history['position'])
-        position_drift = np.linalg.norm(positions[-1][:2] - positions[0][:2])
+        height_std = stats['height_std']
+        position_drift = stats['position_drift']
         
         # 高度稳定性 (20分)
         height_score = max(0, 20 - height_std * 1000)  # 每mm扣1分
@@ -117,8 +447,8 @@ class StabilityMetrics:
         position_score = height_score + drift_score
         
         # 姿态稳定性评分 (35分)
-        roll_std = np.std(self.history['roll'])
-        pitch_std = np.std(self.history['pitch'])
+        roll_std = stats['roll_std']
+        pitch_std = stats['pitch_std']
         
         # Roll稳定性 (17.5分)
         roll_score = max(0, 17.5 - roll_std * 2)  # 每度扣2分
@@ -129,8 +459,8 @@ class StabilityMetrics:
         orientation_score = roll_score + pitch_score
         
         # 能量效率评分 (30分)
-        if len(self.history['joint_torques']) > 0:
-            avg_torque = np.mean(self.history['joint_torques'])
+        avg_torque = stats['torque_mean']
+        if avg_torque is not None:
             # 理想力矩约为重力补偿值，过高或过低都不好
             energy_score = max(0, 30 - abs(avg_torque - 10) * 2)
         else:
@@ -155,31 +485,19 @@ class StabilityMetrics:
         Returns:
             是否稳定
         """
-        if len(self.history['height']) == 0:
+        n = self._n
+        if n == 0:
             return True
-            
-        # 检查高度
-        current_height = self.history['height'][-1]
-        if current_height < self.thresholds['min_height']:
-            return False
-            
-        # 检查倾斜角度
-        current_roll = abs(self.history['roll'][-1])
-        current_pitch = abs(self.history['pitch'][-1])
-        
-        if current_roll > self.thresholds['max_roll']:
-            return False
-        if current_pitch > self.thresholds['max_pitch']:
-            return False
-            
-        # 检查位置漂移
-        current_pos = self.history['position'][-1]
-        drift = np.linalg.norm(current_pos[:2] - self.start_position[:2])
         
-        if drift > self.thresholds['max_position_drift']:
-            return False
-            
-        return True
+        i = n - 1 - self._offset
+        pos = self._position
+        start = self.start_position
+        th = self.thresholds
+        return _is_stable_kernel(
+            self._height.item(i), self._roll.item(i), self._pitch.item(i),
+            pos.item(i, 0) - start[0], pos.item(i, 1) - start[1],
+            th['min_height'], th['max_roll'], th['max_pitch'],
+            th['max_position_drift'])
         
     def get_stability_score(self) -> float:
         """计算稳定性得分（0-100）
@@ -187,30 +505,32 @@ class StabilityMetrics:
         Returns:
             稳定性得分
         """
-        if len(self.history['height']) == 0:
+        n = self._n
+        if n == 0:
             return 100.0
             
-        scores = []
+        stats = self._stats()
+        # 分项得分均为标量：直接用浮点运算求平均，不构造列表再调用 np.mean
         
         # 高度得分（越高越好，但有上限）
-        avg_height = np.mean(self.history['height'])
-        height_score = min(100, (avg_height / 0.3) * 100)
-        scores.append(height_score)
+        avg_height = float(stats['height_mean'])
+        total = min(100.0, (avg_height / 0.3) * 100)
+        count = 1
         
         # 姿态稳定性得分
-        roll_std = np.std(self.history['roll'])
-        pitch_std = np.std(self.history['pitch'])
-        orientation_score = max(0, 100 - (roll_std + pitch_std) * 5)
-        scores.append(orientation_score)
+        roll_std = float(stats['roll_std'])
+        pitch_std = float(stats['pitch_std'])
+        total += max(0.0, 100 - (roll_std + pitch_std) * 5)
+        count += 1
         
         # 位置稳定性得分
-        positions = np.array(self.history['position'])
-        if len(positions) > 1:
-            position_std = np.std(positions[:, :2], axis=0)
-            position_score = max(0, 100 - np.mean(position_std) * 200)
-            scores.append(position_score)
+        position_std = stats['position_xy_std']
+        if position_std is not None:
+            std_x, std_y = position_std.tolist()
+            total += max(0.0, 100 - (std_x + std_y) / 2 * 200)
+            count += 1
         
-        return np.mean(scores)
+        return total / count
         
     def get_summary(self) -> Dict:
         """获取统计摘要
@@ -218,21 +538,21 @@ class StabilityMetrics:
         Returns:
             统计数据字典
         """
-        if len(self.history['height']) == 0:
+        if self._n == 0:
             return {}
             
-        positions = np.array(self.history['position'])
+        stats = self._stats()
         
         return {
             'duration': self.current_time,
-            'avg_height': np.mean(self.history['height']),
-            'min_height': np.min(self.history['height']),
-            'max_height': np.max(self.history['height']),
-            'avg_roll': np.mean(np.abs(self.history['roll'])),
-            'max_roll': np.max(np.abs(self.history['roll'])),
-            'avg_pitch': np.mean(np.abs(self.history['pitch'])),
-            'max_pitch': np.max(np.abs(self.history['pitch'])),
-            'position_drift': np.linalg.norm(positions[-1][:2] - positions[0][:2]),
+            'avg_height': stats['height_mean'],
+            'min_height': stats['height_min'],
+            'max_height': stats['height_max'],
+            'avg_roll': stats['abs_roll_mean'],
+            'max_roll': stats['abs_roll_max'],
+            'avg_pitch': stats['abs_pitch_mean'],
+            'max_pitch': stats['abs_pitch_max'],
+            'position_drift': stats['position_drift'],
             'stability_score': self.get_stability_score(),
             'is_stable': self.is_stable()
         }
@@ -4,30 +4,52 @@
 用于绘制机器人状态、轨迹等
 """
 
+import os
 import numpy as np
+import matplotlib
+
+# 无界面运行（CI/自动测试）时设置 HEADLESS=1，避免初始化 GUI 后端
+if os.environ.get('HEADLESS'):
+    matplotlib.use('Agg')
+
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 
-class Plotter:
-    """数据可视化工具"""
+def _finish_figure(fig, show: bool, savepath: Optional[str]):
+    """保存/显示图窗；不显示时关闭图窗释放内存"""
+    if savepath:
+        fig.savefig(savepath, dpi=100)
+    if show:
+        plt.show()
+    else:
+        plt.close(fig)
+
+
+class StabilityDashboard:
+    """稳定性指标面板
     
-    @staticmethod
-    def plot_stability_metrics(metrics):
-        """绘制稳定性指标
+    图窗、坐标轴和曲线只创建一次，update() 仅通过 set_data 刷新曲线数据，
+    可在仿真循环中周期性调用做实时监控。
+    """
+    
+    def __init__(self, metrics):
+        """初始化
         
         Args:
-            metrics: StabilityMetrics对象
+            metrics: StabilityMetrics对象（或带 history/thresholds 的同类对象）
         """
-        fig, axes = plt.subplots(3, 1, figsize=(12, 10))
-        fig.suptitle('机器人稳定性分析', fontsize=16, fontweight='bold')
+        self.metrics = metrics
+        thresholds = metrics.thresholds
         
-        times = metrics.history['time']
+        self.fig, self.axes = plt.subplots(3, 1, figsize=(12, 10))
+        self.fig.suptitle('机器人稳定性分析', fontsize=16, fontweight='bold')
+        axes = self.axes
         
         # 高度曲线
-        axes[0].plot(times, metrics.history['height'], 'b-', linewidth=2)
-        axes[0].axhline(y=metrics.thresholds['min_height'], 
+        height_line, = axes[0].plot([], [], 'b-', linewidth=2)
+        axes[0].axhline(y=thresholds['min_height'], 
                        color='r', linestyle='--', label='最小高度阈值')
         axes[0].set_ylabel('高度 (m)', fontsize=12)
         axes[0].set_title('基座高度', fontsize=14)
@@ -35,11 +57,11 @@ class Plotter:
         axes[0].legend()
         
         # 姿态角度
-        axes[1].plot(times, metrics.history['roll'], 'r-', linewidth=2, label='Roll')
-        axes[1].plot(times, metrics.history['pitch'], 'g-', linewidth=2, label='Pitch')
-        axes[1].axhline(y=metrics.thresholds['max_roll'], 
+        roll_line, = axes[1].plot([], [], 'r-', linewidth=2, label='Roll')
+        pitch_line, = axes[1].plot([], [], 'g-', linewidth=2, label='Pitch')
+        axes[1].axhline(y=thresholds['max_roll'], 
                        color='r', linestyle='--', alpha=0.5)
-        axes[1].axhline(y=-metrics.thresholds['max_roll'], 
+        axes[1].axhline(y=-thresholds['max_roll'], 
                        color='r', linestyle='--', alpha=0.5)
         axes[1].set_ylabel('角度 (°)', fontsize=12)
         axes[1].set_title('姿态角度', fontsize=14)
@@ -47,21 +69,60 @@ class Plotter:
         axes[1].legend()
         
         # 速度
-        axes[2].plot(times, metrics.history['velocity'], 'purple', linewidth=2)
+        velocity_line, = axes[2].plot([], [], 'purple', linewidth=2)
         axes[2].set_xlabel('时间 (s)', fontsize=12)
         axes[2].set_ylabel('速度 (m/s)', fontsize=12)
         axes[2].set_title('线性速度', fontsize=14)
         axes[2].grid(True, alpha=0.3)
         
+        self.lines = {
+            'height': height_line,
+            'roll': roll_line,
+            'pitch': pitch_line,
+            'velocity': velocity_line
+        }
+        self.update()
+        
+    def update(self):
+        """用 metrics 的最新历史数据刷新曲线"""
+        # history 只取一次；StabilityMetrics 返回的已是有效区间的数组视图
+        history = self.metrics.history
+        times = np.asarray(history['time'])
+        
+        for key, line in self.lines.items():
+            line.set_data(times, np.asarray(history[key]))
+        
+        for ax in self.axes:
+            ax.relim()
+            ax.autoscale_view()
+        self.fig.canvas.draw_idle()
+
+
+class Plotter:
+    """数据可视化工具"""
+    
+    @staticmethod
+    def plot_stability_metrics(metrics, show: bool = True, savepath: Optional[str] = None):
+        """绘制稳定性指标
+        
+        Args:
+            metrics: StabilityMetrics对象
+            show: 是否弹出窗口显示
+            savepath: 保存路径（可选）
+        """
+        dashboard = StabilityDashboard(metrics)
         plt.tight_layout()
-        plt.show()
+        _finish_figure(dashboard.fig, show, savepath)
         
     @staticmethod
-    def plot_joint_trajectories(joint_history: Dict[str, List[float]]):
+    def plot_joint_trajectories(joint_history: Dict[str, List[float]],
+                                show: bool = True, savepath: Optional[str] = None):
         """绘制关节轨迹
         
         Args:
             joint_history: 关节历史数据
+            show: 是否弹出窗口显示
+            savepath: 保存路径（可选）
         """
         num_joints = len(joint_history)
         cols = 3
@@ -84,16 +145,19 @@ class Plotter:
             axes[idx].axis('off')
         
         plt.tight_layout()
-        plt.show()
+        _finish_figure(fig, show, savepath)
         
     @staticmethod
-    def plot_trajectory_2d(positions: np.ndarray):
+    def plot_trajectory_2d(positions: np.ndarray,
+                           show: bool = True, savepath: Optional[str] = None):
         """绘制2D轨迹（俯视图）
         
         Args:
             positions: Nx3的位置数组
+            show: 是否弹出窗口显示
+            savepath: 保存路径（可选）
         """
-        plt.figure(figsize=(10, 10))
+        fig = plt.figure(figsize=(10, 10))
         
         # 绘制轨迹
         plt.plot(positions[:, 0], positions[:, 1], 'b-', linewidth=2, alpha=0.7)
@@ -104,13 +168,13 @@ class Plotter:
         plt.plot(positions[-1, 0], positions[-1, 1], 'ro', 
                 markersize=15, label='终点')
         
-        # 添加箭头指示方向
-        for i in range(0, len(positions)-1, max(1, len(positions)//20)):
-            dx = positions[i+1, 0] - positions[i, 0]
-            dy = positions[i+1, 1] - positions[i, 1]
-            plt.arrow(positions[i, 0], positions[i, 1], dx, dy,
-                     head_width=0.02, head_length=0.01, 
-                     fc='blue', ec='blue', alpha=0.3)
+        # 添加箭头指示方向（单个quiver集合，而非逐个arrow）
+        pts = positions[::max(1, len(positions)//20)]
+        if len(pts) > 1:
+            dxy = np.diff(pts[:, :2], axis=0)
+            plt.quiver(pts[:-1, 0], pts[:-1, 1], dxy[:, 0], dxy[:, 1],
+                      angles='xy', scale_units='xy', scale=1,
+                      width=0.003, color='blue', alpha=0.3)
         
         plt.xlabel('X (m)', fontsize=12)
         plt.ylabel('Y (m)', fontsize=12)
@@ -119,7 +183,7 @@ class Plotter:
         plt.axis('equal')
         plt.legend(fontsize=12)
         plt.tight_layout()
-        plt.show()
+        _finish_figure(fig, show, savepath)
         
     @staticmethod
     def create_animation(positions: np.ndarray, 
@@ -145,16 +209,25 @@ class Plotter:
         ax.grid(True, alpha=0.3)
         ax.axis('equal')
         
+        # 预分配NaN缓冲，逐帧揭示，避免每帧重新切片复制整段轨迹
+        xs = np.full(len(positions), np.nan)
+        ys = np.full(len(positions), np.nan)
+        
         def init():
-            line.set_data([], [])
+            xs.fill(np.nan)
+            ys.fill(np.nan)
+            line.set_data(xs, ys)
             point.set_data([], [])
             return line, point
             
         def update(frame):
-            x = positions[:frame+1, 0]
-            y = positions[:frame+1, 1]
-            line.set_data(x, y)
-            point.set_data([x[-1]], [y[-1]])
+            if frame == 0:  # 循环播放时清空上一轮
+                xs.fill(np.nan)
+                ys.fill(np.nan)
+            xs[frame] = positions[frame, 0]
+            ys[frame] = positions[frame, 1]
+            line.set_data(xs, ys)
+            point.set_data(positions[frame, 0:1], positions[frame, 1:2])
             return line, point
             
         anim = FuncAnimation(fig, update, init_func=init,
@@ -168,8 +241,12 @@ class Plotter:
             plt.show()
 
 
-def demo_plotter():
-    """演示可视化功能"""
+def demo_plotter(show: bool = True):
+    """演示可视化功能
+    
+    Args:
+        show: 是否弹出窗口显示（False 时绘制后直接关闭图窗）
+    """
     # 生成示例数据
     t = np.linspace(0, 10, 1000)
     
@@ -184,11 +261,11 @@ def demo_plotter():
     class DemoMetrics:
         def __init__(self):
             self.history = {
-                'time': t.tolist(),
-                'height': height.tolist(),
-                'roll': roll.tolist(),
-                'pitch': pitch.tolist(),
-                'velocity': (0.01 * np.abs(np.sin(2 * np.pi * 0.2 * t))).tolist()
+                'time': t,
+                'height': height,
+                'roll': roll,
+                'pitch': pitch,
+                'velocity': 0.01 * np.abs(np.sin(2 * np.pi * 0.2 * t))
             }
             self.thresholds = {
                 'min_height': 0.15,
@@ -199,7 +276,7 @@ def demo_plotter():
     
     # 绘制
     print("📊 演示稳定性指标绘图...")
-    Plotter.plot_stability_metrics(metrics)
+    Plotter.plot_stability_metrics(metrics, show=show)
     
     # 绘制2D轨迹
     print("📊 演示2D轨迹绘图...")
@@ -208,7 +285,7 @@ def demo_plotter():
         0.5 * np.cos(2 * np.pi * 0.1 * t),
         height
     ])
-    Plotter.plot_trajectory_2d(positions)
+    Plotter.plot_trajectory_2d(positions, show=show)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,65 @@
+"""
+测试脚本共用的初始化
+
+测试脚本以 `python tests/test_xxx.py` 方式运行，tests/ 目录自动在 sys.path 中，
+直接 `from _setup import make_env` 即可。
+"""
+
+import sys
+from pathlib import Path
+
+# 项目路径
+ROOT = Path(__file__).parent.parent
+CONFIG_PATH = ROOT / 'config' / 'robot_config.yaml'
+URDF_PATH = ROOT / 'models' / 'humanoid_v1.urdf'
+RESULTS_DIR = ROOT / 'results'
+
+# 轨迹日志定点量化：按 int16 记录，1 count = 0.01° / 0.1 mm
+ANGLE_SCALE = 100
+HEIGHT_SCALE = 10000
+
+# 跌倒判定：基座高度低于此值 (m) 即视为跌倒
+FALL_HEIGHT = 0.10
+
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.simulation.environment import SimulationEnvironment
+
+
+def make_env(gui: bool = True) -> SimulationEnvironment:
+    """创建仿真环境、搭建场景并加载机器人
+
+    Args:
+        gui: 是否显示GUI
+
+    Returns:
+        已加载机器人的仿真环境
+    """
+    env = SimulationEnvironment(str(CONFIG_PATH), gui=gui)
+    env.setup_world()
+    env.load_robot(str(URDF_PATH))
+    return env
+
+
+def fuse_targets(out, joint_order, base, corr, limit: float = 2.0):
+    """步态基准角 + 限幅后的姿态校正，按 joint_order 原地写入 out（度）
+
+    corr 中没有的关节不做校正；限幅用比较表达式而不是 np.clip/min/max，
+    每个控制周期只做9次标量运算。
+
+    Args:
+        out: 与 joint_order 对齐的目标数组
+        joint_order: 关节名顺序（env.joint_names）
+        base: 关节名 → 基准角度，需包含 joint_order 中所有关节
+        corr: 关节名 → 校正量
+        limit: 单步校正的绝对值上限（度）
+
+    Returns:
+        out
+    """
+    get = corr.get
+    for k, name in enumerate(joint_order):
+        c = get(name, 0.0)
+        out[k] = base[name] + (limit if c > limit else -limit if c < -limit else c)
+    return out
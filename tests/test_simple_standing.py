@@ -13,7 +13,7 @@ from pathlib import Path
 # 添加项目根目录到路径
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.simulation.environment import SimulationEnvironment
+from _setup import make_env, FALL_HEIGHT
 
 
 def test_simple_standing(duration: float = 30.0, gui: bool = True):
@@ -30,16 +30,9 @@ def test_simple_standing(duration: float = 30.0, gui: bool = True):
     print(f"GUI模式: {'开启' if gui else '关闭'}")
     print()
     
-    # 文件路径
-    base_path = Path(__file__).parent.parent
-    config_path = base_path / 'config' / 'robot_config.yaml'
-    urdf_path = base_path / 'models' / 'humanoid_v1.urdf'
-    
     # 创建仿真环境
     print("1. 初始化仿真环境...")
-    env = SimulationEnvironment(str(config_path), gui=gui)
-    env.setup_world()
-    env.load_robot(str(urdf_path))
+    env = make_env(gui)
     print()
     
     # 设置站立姿态（尝试不同的姿态）
@@ -59,62 +52,78 @@ def test_simple_standing(duration: float = 30.0, gui: bool = True):
     # 用力让机器人保持姿态
     env.set_joint_positions(standing_pose)
     
-    # 稳定一会
+    # 稳定一会（姿态不变，预先转为按 env.joint_names 排列的数组）
     print("   稳定初始姿态...")
+    standing_targets = np.array([standing_pose.get(n, 0.0) for n in env.joint_names])
     for _ in range(1000):
-        env.set_joint_positions(standing_pose)
+        env.set_joint_positions_array(standing_targets)
         env.step()
     
     print("   ✅ 初始姿态已设置")
     print()
     
-    # 记录数据
-    time_history = []
-    height_history = []
-    roll_history = []
-    pitch_history = []
-    
     print("3. 开始测试...")
     print()
     
+    # 时长按仿真时间计；GUI模式按实时速率推进，无GUI时不节流
+    time_step = env.config['simulation']['physics']['time_step']
+    step = env.step_rt if gui else env.step
+    
+    # 补偿后的关节目标：每步从基准姿态数组复制后按下标修改
+    targets = np.empty_like(standing_targets)
+    joint_order = env.joint_names
+    i_l_hip_roll = joint_order.index('left_hip_roll')
+    i_r_hip_roll = joint_order.index('right_hip_roll')
+    i_l_hip_pitch = joint_order.index('left_hip_pitch')
+    i_r_hip_pitch = joint_order.index('right_hip_pitch')
+    i_l_ankle = joint_order.index('left_ankle_pitch')
+    i_r_ankle = joint_order.index('right_ankle_pitch')
+    
+    # 按步数循环；仿真时间由步数直接算出
+    n_steps = int(round(duration / time_step))
+    
+    # 记录数据（预分配float32数组，按步数下标写入）
+    height_history = np.empty(n_steps, dtype=np.float32)
+    roll_history = np.empty(n_steps, dtype=np.float32)
+    pitch_history = np.empty(n_steps, dtype=np.float32)
+    
     try:
         start_time = time.time()
-        step_count = 0
+        n_logged = 0
+        pose = np.empty(6)  # [x, y, z, roll, pitch, yaw]
         
-        while time.time() - start_time < duration:
+        for step_count in range(1, n_steps + 1):
             # 获取当前状态
-            base_state = env.get_base_state()
-            current_height = base_state['position'][2]
-            current_roll, current_pitch, current_yaw = base_state['orientation_euler']
+            _, _, current_height, current_roll, current_pitch, current_yaw = \
+                env.get_base_state_into(pose).tolist()
             
             # 简单的姿态补偿
-            compensation = standing_pose.copy()
+            np.copyto(targets, standing_targets)
             
             # 根据Roll角度微调hip_roll
             roll_correction = -current_roll * 0.1  # 很小的反馈增益
-            compensation['left_hip_roll'] = roll_correction
-            compensation['right_hip_roll'] = -roll_correction
+            targets[i_l_hip_roll] = roll_correction
+            targets[i_r_hip_roll] = -roll_correction
             
             # 根据Pitch角度微调hip_pitch和ankle_pitch
             pitch_correction = -current_pitch * 0.1
-            compensation['left_hip_pitch'] += pitch_correction
-            compensation['right_hip_pitch'] += pitch_correction
-            compensation['left_ankle_pitch'] -= pitch_correction * 0.5
-            compensation['right_ankle_pitch'] -= pitch_correction * 0.5
+            targets[i_l_hip_pitch] += pitch_correction
+            targets[i_r_hip_pitch] += pitch_correction
+            targets[i_l_ankle] -= pitch_correction * 0.5
+            targets[i_r_ankle] -= pitch_correction * 0.5
             
             # 应用补偿后的姿态
-            env.set_joint_positions(compensation)
+            env.set_joint_positions_array(targets)
             
             # 执行仿真步
-            env.step()
-            step_count += 1
+            step()
             
             # 记录数据
-            elapsed_time = time.time() - start_time
-            time_history.append(elapsed_time)
-            height_history.append(current_height)
-            roll_history.append(current_roll)
-            pitch_history.append(current_pitch)
+            elapsed_time = step_count * time_step
+            height_history[n_logged] = current_height
+            roll_history[n_logged] = current_roll
+            pitch_history[n_logged] = current_pitch
+            n_logged += 1
             
             # 每秒打印一次状态
             if step_count % 1000 == 0:
@@ -124,33 +133,35 @@ def test_simple_standing(duration: float = 30.0, gui: bool = True):
                       f"Pitch={current_pitch:.1f}°")
             
             # 检查是否跌倒
-            if current_height < 0.10:
+            if current_height < FALL_HEIGHT:
                 print("\n⚠️ 机器人跌倒！测试终止")
                 break
-            
-            # 短暂延迟以避免过快
-            time.sleep(0.001)
                 
     except KeyboardInterrupt:
         print("\n⏹️ 用户手动停止测试")
     
+    wall_time = time.time() - start_time
+    
     # 计算并显示结果
     print("\n" + "=" * 60)
     print("测试结果")
     print("=" * 60)
     
-    if len(time_history) > 0:
+    if n_logged > 0:
+        height_history = height_history[:n_logged]
+        roll_history = roll_history[:n_logged]
+        pitch_history = pitch_history[:n_logged]
         height_std = np.std(height_history)
         roll_std = np.std(roll_history)
         pitch_std = np.std(pitch_history)
-        test_duration = time_history[-1]
+        test_duration = n_logged * time_step
         
         print(f"\n详细指标:")
         print(f"  - 高度标准差: {height_std:.4f}m")
         print(f"  - Roll标准差: {roll_std:.2f}°")
         print(f"  - Pitch标准差: {pitch_std:.2f}°")
         print(f"  - 平均高度: {np.mean(height_history):.3f}m")
-        print(f"  - 测试时长: {test_duration:.1f}s")
+        print(f"  - 测试时长: {test_duration:.1f}s (实际耗时 {wall_time:.1f}s)")
         
         # 判断成功标准
         print(f"\nM1成功标准检查:")
@@ -5,8 +5,9 @@
 """
 
 import sys
-import time
+import math
 import numpy as np
+import pybullet as p
 from pathlib import Path
 
 # 添加项目路径
@@ -14,27 +15,47 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from src.simulation.environment import SimulationEnvironment
 from src.utils.metrics import StabilityMetrics
+from _setup import make_env
 
 
-def test_standing_stability(duration: float = 5.0):
+def _prepare_env(env, gui: bool):
+    """未传入环境时新建；传入时复用并把机器人恢复到初始位姿
+    
+    Returns:
+        (env, 是否由本测试创建)
+    """
+    if env is None:
+        return make_env(gui), True
+    env.reset_robot_state()
+    return env, False
+
+
+def _finish(env, own_env: bool, interactive: bool):
+    """测试结束：可选等待回车，只关闭本测试创建的环境"""
+    if interactive:
+        print("\n按Enter键关闭...")
+        input()
+    if own_env:
+        env.close()
+
+
+def test_standing_stability(duration: float = 5.0, env: SimulationEnvironment = None,
+                            gui: bool = True, interactive: bool = False):
     """测试站立稳定性
     
     Args:
         duration: 测试时长（秒）
+        env: 复用的仿真环境（可选，传入时不会在结束时关闭）
+        gui: 新建环境时是否显示GUI
+        interactive: 结束后是否等待回车（保持GUI窗口）
     """
     print("=" * 60)
     print("🧍 站立稳定性测试")
     print("=" * 60)
     
-    # 文件路径
-    base_path = Path(__file__).parent.parent
-    config_path = base_path / 'config' / 'robot_config.yaml'
-    urdf_path = base_path / 'models' / 'humanoid_v1.urdf'
-    
-    # 创建仿真环境
-    env = SimulationEnvironment(str(config_path), gui=True)
-    env.setup_world()
-    env.load_robot(str(urdf_path))
+    env, own_env = _prepare_env(env, gui)
+    # GUI模式按实时速率推进，无GUI时不节流
+    step = env.step_rt if env.gui else env.step
     
     # 创建稳定性评估器
     metrics = StabilityMetrics()
@@ -53,8 +74,7 @@ def test_standing_stability(duration: float = 5.0):
     # 稳定一段时间让机器人settle
     print("\n⏳ 初始化姿态...")
     for _ in range(500):
-        env.step()
-        time.sleep(1/240)
+        step()
     
     # 开始测试
     print(f"\n🚀 开始测试 (时长={duration}秒)")
@@ -63,28 +83,29 @@ def test_standing_stability(duration: float = 5.0):
     time_step = env.config['simulation']['physics']['time_step']
     steps = int(duration / time_step)
     
+    state = np.empty(9)  # [x, y, z, roll, pitch, yaw, vx, vy, vz]
+    print_every = int(0.5 / time_step)
+    
     for i in range(steps):
-        env.step()
+        step()
         
-        # 收集数据
-        base_state = env.get_base_state()
-        joint_states = env.get_joint_states()
-        imu_data = env.get_imu_data()
+        # 收集数据：metrics 只用到基座位姿/速度和关节力矩，
+        # 基座状态写入预分配数组、力矩走数组接口（都不构造字典），IMU数据不再读取
+        _, _, z, roll, pitch, _, vx, vy, vz = env.get_base_state_into(state).tolist()
+        _, _, joint_torques = env.get_joint_state_arrays()
         
-        metrics.update(base_state, joint_states, imu_data)
+        metrics.update_from_arrays(state[:3], state[3:6],
+                                   math.sqrt(vx * vx + vy * vy + vz * vz),
+                                   joint_torques)
         
         # 每0.5秒打印一次
-        if i % int(0.5 / time_step) == 0:
-            pos = base_state['position']
-            euler = base_state['orientation_euler']
+        if i % print_every == 0:
             print(f"t={i*time_step:5.2f}s | "
-                  f"高度={pos[2]:.3f}m | "
-                  f"Roll={euler[0]:6.2f}° | "
-                  f"Pitch={euler[1]:6.2f}° | "
+                  f"高度={z:.3f}m | "
+                  f"Roll={roll:6.2f}° | "
+                  f"Pitch={pitch:6.2f}° | "
                   f"稳定={metrics.is_stable()}")
         
-        time.sleep(time_step)
-        
         # 检查是否摔倒
         if not metrics.is_stable():
             print("\n❌ 机器人失去平衡!")
@@ -96,32 +117,25 @@ def test_standing_stability(duration: float = 5.0):
     print("=" * 60)
     metrics.print_summary()
     
-    # 保持窗口打开
-    print("\n按Enter键关闭...")
-    input()
-    
-    env.close()
+    _finish(env, own_env, interactive)
 
 
-def test_with_disturbance(duration: float = 10.0):
+def test_with_disturbance(duration: float = 10.0, env: SimulationEnvironment = None,
+                          gui: bool = True, interactive: bool = False):
     """测试扰动下的稳定性
     
     Args:
         duration: 测试时长（秒）
+        env: 复用的仿真环境（可选，传入时不会在结束时关闭）
+        gui: 新建环境时是否显示GUI
+        interactive: 结束后是否等待回车（保持GUI窗口）
     """
     print("=" * 60)
     print("💨 扰动测试")
     print("=" * 60)
     
-    # 文件路径
-    base_path = Path(__file__).parent.parent
-    config_path = base_path / 'config' / 'robot_config.yaml'
-    urdf_path = base_path / 'models' / 'humanoid_v1.urdf'
-    
-    # 创建仿真环境
-    env = SimulationEnvironment(str(config_path), gui=True)
-    env.setup_world()
-    env.load_robot(str(urdf_path))
+    env, own_env = _prepare_env(env, gui)
+    step = env.step_rt if env.gui else env.step
     
     metrics = StabilityMetrics()
     
@@ -139,8 +153,7 @@ def test_with_disturbance(duration: float = 10.0):
     # 稳定
     print("\n⏳ 初始化...")
     for _ in range(500):
-        env.step()
-        time.sleep(1/240)
+        step()
     
     # 测试
     print(f"\n🚀 开始测试")
@@ -150,15 +163,16 @@ def test_with_disturbance(duration: float = 10.0):
     time_step = env.config['simulation']['physics']['time_step']
     steps = int(duration / time_step)
     disturbance_applied = False
+    force = [0.0, 50.0, 0.0]  # Y方向50N
+    position = [0.0, 0.0, 0.2]
+    print_every = int(0.5 / time_step)
+    state = np.empty(9)  # [x, y, z, roll, pitch, yaw, vx, vy, vz]
     
     for i in range(steps):
         current_time = i * time_step
         
-        # 在3秒时施加侧向扰动
-        if current_time >= 3.0 and not disturbance_applied:
-            import pybullet as p
-            force = [0, 50, 0]  # Y方向50N
-            position = [0, 0, 0.2]
+        # 在3秒时施加侧向扰动（施加后只剩一次布尔判断）
+        if not disturbance_applied and current_time >= 3.0:
             p.applyExternalForce(
                 env.robot_id,
                 -1,  # 作用在base上
@@ -169,27 +183,24 @@ def test_with_disturbance(duration: float = 10.0):
             print(f"\n💥 施加扰动: {force}")
             disturbance_applied = True
         
-        env.step()
+        step()
         
-        # 收集数据
-        base_state = env.get_base_state()
-        joint_states = env.get_joint_states()
-        imu_data = env.get_imu_data()
+        # 收集数据（同 test_standing_stability）
+        _, _, z, roll, pitch, _, vx, vy, vz = env.get_base_state_into(state).tolist()
+        _, _, joint_torques = env.get_joint_state_arrays()
         
-        metrics.update(base_state, joint_states, imu_data)
+        metrics.update_from_arrays(state[:3], state[3:6],
+                                   math.sqrt(vx * vx + vy * vy + vz * vz),
+                                   joint_torques)
         
         # 打印
-        if i % int(0.5 / time_step) == 0:
-            pos = base_state['position']
-            euler = base_state['orientation_euler']
+        if i % print_every == 0:
             print(f"t={current_time:5.2f}s | "
-                  f"高度={pos[2]:.3f}m | "
-                  f"Roll={euler[0]:6.2f}° | "
-                  f"Pitch={euler[1]:6.2f}° | "
+                  f"高度={z:.3f}m | "
+                  f"Roll={roll:6.2f}° | "
+                  f"Pitch={pitch:6.2f}° | "
                   f"稳定={metrics.is_stable()}")
         
-        time.sleep(time_step)
-        
         if not metrics.is_stable():
             print("\n❌ 机器人失去平衡!")
             break
@@ -200,10 +211,7 @@ def test_with_disturbance(duration: float = 10.0):
     print("=" * 60)
     metrics.print_summary()
     
-    print("\n按Enter键关闭...")
-    input()
-    
-    env.close()
+    _finish(env, own_env, interactive)
 
 
 if __name__ == '__main__':
@@ -211,14 +219,25 @@ if __name__ == '__main__':
     
     parser = argparse.ArgumentParser(description='站立稳定性测试')
     parser.add_argument('--mode', type=str, default='basic',
-                       choices=['basic', 'disturbance'],
-                       help='测试模式: basic(基础站立) 或 disturbance(扰动测试)')
+                       choices=['basic', 'disturbance', 'all'],
+                       help='测试模式: basic(基础站立)、disturbance(扰动测试) 或 all(共用一个环境依次运行)')
     parser.add_argument('--duration', type=float, default=5.0,
                        help='测试时长（秒）')
+    parser.add_argument('--no-gui', action='store_true',
+                       help='不显示GUI')
+    parser.add_argument('--interactive', action='store_true',
+                       help='测试结束后等待回车再关闭')
     
     args = parser.parse_args()
+    gui = not args.no_gui
     
     if args.mode == 'basic':
-        test_standing_stability(args.duration)
+        test_standing_stability(args.duration, gui=gui, interactive=args.interactive)
+    elif args.mode == 'disturbance':
+        test_with_disturbance(args.duration, gui=gui, interactive=args.interactive)
     else:
-        test_with_disturbance(args.duration)
+        # 只加载一次模型，两项测试之间重置机器人状态
+        env = make_env(gui)
+        test_standing_stability(args.duration, env=env)
+        test_with_disturbance(args.duration, env=env, interactive=args.interactive)
+        env.close()
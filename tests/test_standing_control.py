@@ -12,7 +12,7 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.simulation.environment import SimulationEnvironment
+from _setup import make_env, RESULTS_DIR, ANGLE_SCALE, HEIGHT_SCALE, FALL_HEIGHT
 from src.control.posture_controller import StandingController, PIDGains
 
 
@@ -27,15 +27,9 @@ def test_standing(duration: float = 30.0, gui: bool = True):
     print("  第二阶段 M1: 站立控制测试")
     print("=" * 60)
     
-    base_path = Path(__file__).parent.parent
-    config_path = base_path / 'config' / 'robot_config.yaml'
-    urdf_path = base_path / 'models' / 'humanoid_v1.urdf'
-    
     # ── 1. 初始化仿真 ──
     print("\n[1/4] 初始化仿真环境...")
-    env = SimulationEnvironment(str(config_path), gui=gui)
-    env.setup_world()
-    env.load_robot(str(urdf_path))
+    env = make_env(gui)
     
     # ── 2. 初始化控制器 ──
     print("\n[2/4] 初始化站立控制器...")
@@ -65,20 +59,36 @@ def test_standing(duration: float = 30.0, gui: bool = True):
     sim_dt = 0.001     # 仿真步长 1ms
     steps_per_ctrl = int(dt / sim_dt)
     
-    time_log = []
-    height_log = []
-    roll_log = []
-    pitch_log = []
-    
+    # 预分配日志数组（时间轴用float64，测量量用float32），i 为已记录条数
+    n_max = int(duration / dt) + 16
+    time_log = np.empty(n_max)
+    # 高度/姿态角按定点 int16 记录（见 _setup 中的比例），评估时再换算
+    height_log = np.empty(n_max, dtype=np.int16)
+    roll_log = np.empty(n_max, dtype=np.int16)
+    pitch_log = np.empty(n_max, dtype=np.int16)
+    i = 0
+    
+    # 按控制周期数循环；仿真时间由步数直接算出，不做浮点累加
+    n_ctrl = int(round(duration / dt))
     fallen = False
     sim_time = 0.0
+    wall_start = time.time()
+    pose = np.empty(6)  # [x, y, z, roll, pitch, yaw]
+    
+    # 状态行先攒起来：无GUI时每10行（10秒）写一次stdout，GUI下逐行输出
+    status_lines = []
+    status_batch = 1 if gui else 10
+    
+    def flush_status():
+        if status_lines:
+            sys.stdout.write(''.join(status_lines))
+            sys.stdout.flush()
+            status_lines.clear()
     
     try:
-        while sim_time < duration:
+        for k in range(1, n_ctrl + 1):
             # 获取状态
-            base = env.get_base_state()
-            h = base['position'][2]
-            roll, pitch, yaw = base['orientation_euler']
+            _, _, h, roll, pitch, yaw = env.get_base_state_into(pose).tolist()
             
             # 计算控制
             targets = controller.compute_control(h, roll, pitch, dt)
@@ -87,52 +97,58 @@ def test_standing(duration: float = 30.0, gui: bool = True):
             env.set_joint_positions(targets)
             
             # 步进仿真
-            for _ in range(steps_per_ctrl):
-                env.step()
+            env.run_steps(steps_per_ctrl)
             
-            sim_time += dt
+            sim_time = k * dt
             
             # 记录
-            time_log.append(sim_time)
-            height_log.append(h)
-            roll_log.append(roll)
-            pitch_log.append(pitch)
+            time_log[i] = sim_time
+            height_log[i] = round(h * HEIGHT_SCALE)
+            roll_log[i] = round(roll * ANGLE_SCALE)
+            pitch_log[i] = round(pitch * ANGLE_SCALE)
+            i += 1
             
             # 每秒打印
-            if len(time_log) % 100 == 0:
-                print(f"   t={sim_time:5.1f}s  h={h:.4f}m  "
-                      f"roll={roll:+6.1f}°  pitch={pitch:+6.1f}°")
+            if i % 100 == 0:
+                status_lines.append(f"   t={sim_time:5.1f}s  h={h:.4f}m  "
+                                    f"roll={roll:+6.1f}°  pitch={pitch:+6.1f}°\n")
+                if len(status_lines) >= status_batch:
+                    flush_status()
             
             # 跌倒检测
-            if h < 0.10:
-                print(f"\n   ⚠️  机器人跌倒 (h={h:.3f}m < 0.10m)")
+            if h < FALL_HEIGHT:
+                flush_status()
+                print(f"\n   ⚠️  机器人跌倒 (h={h:.3f}m < {FALL_HEIGHT:.2f}m)")
                 fallen = True
                 break
                 
     except KeyboardInterrupt:
+        flush_status()
         print("\n   ⏹️  用户中断")
+    flush_status()
     
-    actual_duration = time_log[-1] if time_log else 0.0
+    wall_time = time.time() - wall_start
+    time_log = time_log[:i]
+    height_log = np.true_divide(height_log[:i], HEIGHT_SCALE, dtype=np.float32)
+    roll_log = np.true_divide(roll_log[:i], ANGLE_SCALE, dtype=np.float32)
+    pitch_log = np.true_divide(pitch_log[:i], ANGLE_SCALE, dtype=np.float32)
+    actual_duration = float(time_log[-1]) if i else 0.0
     
     # ── 4. 评估结果 ──
     print(f"\n[4/4] 评估结果")
     print("=" * 60)
     
-    if len(time_log) < 2:
+    if i < 2:
         print("❌ 数据不足，无法评估")
         env.close()
         return
     
-    h_arr = np.array(height_log)
-    r_arr = np.array(roll_log)
-    p_arr = np.array(pitch_log)
-    
-    h_mean = np.mean(h_arr)
-    h_std  = np.std(h_arr)
-    r_std  = np.std(r_arr)
-    p_std  = np.std(p_arr)
+    h_mean = np.mean(height_log)
+    h_std  = np.std(height_log)
+    r_std  = np.std(roll_log)
+    p_std  = np.std(pitch_log)
     
-    print(f"\n  测试时长:  {actual_duration:.1f}s / {duration:.1f}s")
+    print(f"\n  测试时长:  {actual_duration:.1f}s / {duration:.1f}s  (实际耗时 {wall_time:.1f}s)")
     print(f"  跌倒:     {'是 ❌' if fallen else '否 ✅'}")
     print(f"\n  高度:  均值={h_mean:.4f}m  标准差={h_std:.4f}m")
     print(f"  Roll:  标准差={r_std:.2f}°")
@@ -163,26 +179,29 @@ def test_standing(duration: float = 30.0, gui: bool = True):
         
         fig, axes = plt.subplots(3, 1, figsize=(12, 8), sharex=True)
         
-        axes[0].plot(time_log, height_log, 'b-', linewidth=0.8)
+        # 长时间运行时按步长抽稀到约4000点，绘图耗时不随时长线性增长
+        s = slice(None, None, max(1, len(time_log) // 4000))
+        
+        axes[0].plot(time_log[s], height_log[s], 'b-', linewidth=0.8)
         axes[0].axhline(0.24, color='r', ls='--', alpha=0.5, label='目标')
         axes[0].set_ylabel('高度 (m)')
         axes[0].legend()
         axes[0].grid(True, alpha=0.3)
         axes[0].set_title(f'站立控制测试  (时长={actual_duration:.1f}s)')
         
-        axes[1].plot(time_log, roll_log, 'g-', linewidth=0.8)
+        axes[1].plot(time_log[s], roll_log[s], 'g-', linewidth=0.8)
         axes[1].axhline(0, color='r', ls='--', alpha=0.5)
         axes[1].set_ylabel('Roll (°)')
         axes[1].grid(True, alpha=0.3)
         
-        axes[2].plot(time_log, pitch_log, 'm-', linewidth=0.8)
+        axes[2].plot(time_log[s], pitch_log[s], 'm-', linewidth=0.8)
         axes[2].axhline(0, color='r', ls='--', alpha=0.5)
         axes[2].set_ylabel('Pitch (°)')
         axes[2].set_xlabel('时间 (s)')
         axes[2].grid(True, alpha=0.3)
         
         plt.tight_layout()
-        out = base_path / 'results'
+        out = RESULTS_DIR
         out.mkdir(exist_ok=True)
         path = out / 'standing_control.png'
         plt.savefig(path, dpi=150)
@@ -12,7 +12,7 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.simulation.environment import SimulationEnvironment
+from _setup import make_env, fuse_targets, RESULTS_DIR, ANGLE_SCALE, HEIGHT_SCALE, FALL_HEIGHT
 from src.control.gait_generator import GaitGenerator, GaitParams
 from src.control.posture_controller import PostureController, PIDGains
 
@@ -22,15 +22,9 @@ def test_stepping(duration: float = 20.0, gui: bool = True):
     print("  第二阶段 M2: 原地踏步测试")
     print("=" * 60)
 
-    base_path = Path(__file__).parent.parent
-    config_path = base_path / 'config' / 'robot_config.yaml'
-    urdf_path   = base_path / 'models' / 'humanoid_v1.urdf'
-
     # ── 1. 仿真初始化 ──
     print("\n[1/4] 初始化仿真环境...")
-    env = SimulationEnvironment(str(config_path), gui=gui)
-    env.setup_world()
-    env.load_robot(str(urdf_path))
+    env = make_env(gui)
 
     # ── 2. 控制器初始化 ──
     print("\n[2/4] 初始化控制器...")
@@ -62,14 +56,13 @@ def test_stepping(duration: float = 20.0, gui: bool = True):
     sim_dt = 0.001
     steps_per_ctrl = int(dt / sim_dt)
     
-    for _ in range(200):  # 2秒 @100Hz
-        env.set_joint_positions({
-            'head_pitch': 0, 'left_hip_roll': 0, 'left_hip_pitch': 0,
-            'left_knee': 0, 'left_ankle_pitch': 0, 'right_hip_roll': 0,
-            'right_hip_pitch': 0, 'right_knee': 0, 'right_ankle_pitch': 0,
-        })
-        for _ in range(steps_per_ctrl):
-            env.step()
+    # 关节目标按 env.joint_names 顺序写入同一个数组，逐拍复用
+    joint_order = env.joint_names
+    targets = np.zeros(len(joint_order))
+    
+    # 直腿零位目标在位置控制下会保持，发送一次后连续推进2秒
+    env.set_joint_positions_array(targets)
+    env.run_steps(200 * steps_per_ctrl)
     
     base = env.get_base_state()
     print(f"   预热完成: h={base['position'][2]:.4f}m")
@@ -77,18 +70,35 @@ def test_stepping(duration: float = 20.0, gui: bool = True):
     # ── 3. 控制循环 ──
     print(f"\n[3/4] 开始原地踏步 (目标: {duration}秒)...")
     
-    time_log, height_log, roll_log, pitch_log = [], [], [], []
-    phase_log, step_count_log = [], []
+    # 预分配日志数组（时间轴用float64，测量量用float32），i 为已记录条数
+    n_max = int(duration / dt) + 16
+    time_log = np.empty(n_max)
+    # 高度/姿态角按定点 int16 记录（见 _setup 中的比例），评估时再换算
+    height_log = np.empty(n_max, dtype=np.int16)
+    roll_log = np.empty(n_max, dtype=np.int16)
+    pitch_log = np.empty(n_max, dtype=np.int16)
+    phase_log = np.empty(n_max, dtype=np.int8)
+    step_count_log = np.empty(n_max, dtype=np.int16)
+    i = 0
 
     fallen = False
     sim_time = 0.0
+    pose = np.empty(6)  # [x, y, z, roll, pitch, yaw]
+
+    # 状态行先攒起来：无GUI时每10行（10秒）写一次stdout，GUI下逐行输出
+    status_lines = []
+    status_batch = 1 if gui else 10
+
+    def flush_status():
+        if status_lines:
+            sys.stdout.write(''.join(status_lines))
+            sys.stdout.flush()
+            status_lines.clear()
 
     try:
         while sim_time < duration:
             # 读取状态
-            base = env.get_base_state()
-            h = base['position'][2]
-            roll, pitch, yaw = base['orientation_euler']
+            _, _, h, roll, pitch, yaw = env.get_base_state_into(pose).tolist()
 
             # (a) 步态生成 → 基准关节角度
             gait_joints = gait.update(dt)
@@ -98,68 +108,74 @@ def test_stepping(duration: float = 20.0, gui: bool = True):
             pid_corr = posture_pid.compute_joint_corrections(rc, pc)
 
             # (c) 合并: 步态 + PID补偿（限幅）
-            final = {}
-            for jname, gait_val in gait_joints.items():
-                corr = pid_corr.get(jname, 0.0)
-                corr = np.clip(corr, -2.0, 2.0)  # 每步最多补偿2°
-                final[jname] = gait_val + corr
+            fuse_targets(targets, joint_order, gait_joints, pid_corr)  # 每步最多补偿2°
 
             # 发送
-            env.set_joint_positions(final)
+            env.set_joint_positions_array(targets)
 
             # 仿真步进
-            for _ in range(steps_per_ctrl):
-                env.step()
+            env.run_steps(steps_per_ctrl)
 
             sim_time += dt
 
             # 记录
-            time_log.append(sim_time)
-            height_log.append(h)
-            roll_log.append(roll)
-            pitch_log.append(pitch)
-            phase_log.append(gait.phase.value)
-            step_count_log.append(gait.step_count)
-
-            if len(time_log) % 100 == 0:
-                print(f"   t={sim_time:5.1f}s  h={h:.4f}m  "
-                      f"roll={roll:+6.1f}°  pitch={pitch:+6.1f}°  "
-                      f"[{gait.phase_name}]  steps={gait.step_count}")
-
-            if h < 0.10:
+            time_log[i] = sim_time
+            height_log[i] = round(h * HEIGHT_SCALE)
+            roll_log[i] = round(roll * ANGLE_SCALE)
+            pitch_log[i] = round(pitch * ANGLE_SCALE)
+            phase_log[i] = gait.phase.value
+            step_count_log[i] = gait.step_count
+            i += 1
+
+            if i % 100 == 0:
+                status_lines.append(f"   t={sim_time:5.1f}s  h={h:.4f}m  "
+                                    f"roll={roll:+6.1f}°  pitch={pitch:+6.1f}°  "
+                                    f"[{gait.phase_name}]  steps={gait.step_count}\n")
+                if len(status_lines) >= status_batch:
+                    flush_status()
+
+            if h < FALL_HEIGHT:
+                flush_status()
                 print(f"\n   ⚠️  机器人跌倒 (h={h:.3f}m)")
                 fallen = True
                 break
 
     except KeyboardInterrupt:
+        flush_status()
         print("\n   ⏹️  用户中断")
-
-    actual_duration = time_log[-1] if time_log else 0.0
+    flush_status()
+
+    time_log = time_log[:i]
+    height_log = np.true_divide(height_log[:i], HEIGHT_SCALE, dtype=np.float32)
+    roll_log = np.true_divide(roll_log[:i], ANGLE_SCALE, dtype=np.float32)
+    pitch_log = np.true_divide(pitch_log[:i], ANGLE_SCALE, dtype=np.float32)
+    phase_log = phase_log[:i]
+    step_count_log = step_count_log[:i]
+    actual_duration = float(time_log[-1]) if i else 0.0
     total_steps = gait.step_count
 
     # ── 4. 评估 ──
     print(f"\n[4/4] 评估结果")
     print("=" * 60)
     
-    h_arr = np.array(height_log)
-    r_arr = np.array(roll_log)
-    p_arr = np.array(pitch_log)
-
     print(f"\n  测试时长:  {actual_duration:.1f}s")
     print(f"  跌倒:     {'是 ❌' if fallen else '否 ✅'}")
     print(f"  总步数:   {total_steps}")
-    print(f"  高度:  均值={np.mean(h_arr):.4f}m  标准差={np.std(h_arr):.4f}m")
-    print(f"  Roll:  std={np.std(r_arr):.2f}°  max={np.max(np.abs(r_arr)):.2f}°")
-    print(f"  Pitch: std={np.std(p_arr):.2f}°  max={np.max(np.abs(p_arr)):.2f}°")
+    # |roll|/|pitch| 峰值只算一次：max(最大值, -最小值)，不生成 abs 临时数组
+    max_roll = max(roll_log.max(), -roll_log.min())
+    max_pitch = max(pitch_log.max(), -pitch_log.min())
+    print(f"  高度:  均值={np.mean(height_log):.4f}m  标准差={np.std(height_log):.4f}m")
+    print(f"  Roll:  std={np.std(roll_log):.2f}°  max={max_roll:.2f}°")
+    print(f"  Pitch: std={np.std(pitch_log):.2f}°  max={max_pitch:.2f}°")
 
     c1 = not fallen and actual_duration >= min(duration, 10.0)
     c2 = total_steps >= 4
-    c3 = np.max(np.abs(r_arr)) < 30
+    c3 = max_roll < 30
 
     print(f"\n  ╔══════════════════════════════════════╗")
     print(f"  ║ 保持不倒    : {'✅' if c1 else '❌'}                      ║")
     print(f"  ║ 左右脚交替  : {total_steps}步  {'✅' if c2 else '❌'}                ║")
-    print(f"  ║ 姿态可控    : max_roll={np.max(np.abs(r_arr)):.1f}°  {'✅' if c3 else '❌'}  ║")
+    print(f"  ║ 姿态可控    : max_roll={max_roll:.1f}°  {'✅' if c3 else '❌'}  ║")
     if c1 and c2 and c3:
         print(f"  ║                                      ║")
         print(f"  ║   🎉 M2 里程碑达成！                 ║")
@@ -171,24 +187,26 @@ def test_stepping(duration: float = 20.0, gui: bool = True):
         matplotlib.use('Agg')
         import matplotlib.pyplot as plt
         fig, axes = plt.subplots(4, 1, figsize=(12, 10), sharex=True)
-        axes[0].plot(time_log, height_log, 'b-', lw=0.8)
+        # 长时间运行时按步长抽稀到约4000点，绘图耗时不随时长线性增长
+        s = slice(None, None, max(1, len(time_log) // 4000))
+        axes[0].plot(time_log[s], height_log[s], 'b-', lw=0.8)
         axes[0].set_ylabel('Height (m)')
         axes[0].grid(True, alpha=0.3)
         axes[0].set_title(f'Stepping Test  ({actual_duration:.1f}s, {total_steps} steps)')
-        axes[1].plot(time_log, roll_log, 'g-', lw=0.8)
+        axes[1].plot(time_log[s], roll_log[s], 'g-', lw=0.8)
         axes[1].set_ylabel('Roll (deg)')
         axes[1].grid(True, alpha=0.3)
-        axes[2].plot(time_log, pitch_log, 'm-', lw=0.8)
+        axes[2].plot(time_log[s], pitch_log[s], 'm-', lw=0.8)
         axes[2].set_ylabel('Pitch (deg)')
         axes[2].grid(True, alpha=0.3)
-        axes[3].plot(time_log, phase_log, 'k-', lw=1.0)
+        axes[3].plot(time_log[s], phase_log[s], 'k-', lw=1.0)
         axes[3].set_ylabel('Phase')
         axes[3].set_xlabel('Time (s)')
         axes[3].set_yticks([1, 2, 3])
         axes[3].set_yticklabels(['Double', 'L-Swing', 'R-Swing'])
         axes[3].grid(True, alpha=0.3)
         plt.tight_layout()
-        out = base_path / 'results'
+        out = RESULTS_DIR
         out.mkdir(exist_ok=True)
         path = out / 'stepping_test.png'
         plt.savefig(path, dpi=150)
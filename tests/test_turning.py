@@ -13,27 +13,51 @@ import sys
 import argparse
 import numpy as np
 from pathlib import Path
+from multiprocessing import Process
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.simulation.environment import SimulationEnvironment
+from _setup import make_env, fuse_targets, RESULTS_DIR, FALL_HEIGHT
 from src.control.gait_generator import GaitGenerator, GaitParams
 from src.control.posture_controller import PostureController, PIDGains
 
 
+def _render_plot(path, t_arr, dx_arr, dy_arr, dyaw_arr, h_arr):
+    """绘制并保存转向结果图（在子进程中运行）"""
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        fig, axes = plt.subplots(3, 1, figsize=(12, 8), sharex=True)
+        axes[0].plot(t_arr, dx_arr, 'b-', lw=0.8, label='|dx|')
+        axes[0].plot(t_arr, dy_arr, 'r-', lw=0.8, label='|dy|')
+        axes[0].set_ylabel('Displacement (m)')
+        axes[0].legend()
+        axes[0].grid(True, alpha=0.3)
+        axes[0].set_title('Turning & Stopping Test')
+        axes[1].plot(t_arr, dyaw_arr, 'g-', lw=0.8)
+        axes[1].set_ylabel('Yaw Change (deg)')
+        axes[1].grid(True, alpha=0.3)
+        axes[2].plot(t_arr, h_arr, 'm-', lw=0.8)
+        axes[2].set_ylabel('Height (m)')
+        axes[2].set_xlabel('Time (s)')
+        axes[2].grid(True, alpha=0.3)
+        plt.tight_layout()
+        path.parent.mkdir(exist_ok=True)
+        plt.savefig(path, dpi=150)
+        plt.close()
+        print(f"\n  📊 结果图: {path}")
+    except Exception as e:
+        print(f"\n  ⚠️  图表失败: {e}")
+
+
 def test_turning(gui: bool = True):
     print("=" * 60)
     print("  第二阶段 M4: 转向与停止测试")
     print("=" * 60)
 
-    base_path = Path(__file__).parent.parent
-    config_path = base_path / 'config' / 'robot_config.yaml'
-    urdf_path   = base_path / 'models' / 'humanoid_v1.urdf'
-
     print("\n[1/2] 初始化...")
-    env = SimulationEnvironment(str(config_path), gui=gui)
-    env.setup_world()
-    env.load_robot(str(urdf_path))
+    env = make_env(gui)
 
     gait = GaitGenerator(GaitParams(
         step_height=0.015,
@@ -54,59 +78,61 @@ def test_turning(gui: bool = True):
     sim_dt = 0.001
     steps_per_ctrl = int(dt / sim_dt)
     
-    time_log, x_log, y_log, yaw_log, height_log = [], [], [], [], []
-    phase_labels = []
+    # 关节目标按 env.joint_names 顺序写入同一个数组，逐拍复用
+    joint_order = env.joint_names
+    targets = np.zeros(len(joint_order))
+    pose = np.empty(6)  # [x, y, z, roll, pitch, yaw]
+    
+    # 日志预分配（前进10s + 转向50s + 停止5s），按下标写入；
+    # x/y/yaw 要做首尾差，保留 float64
+    n_max = int((10.0 + 50.0 + 5.0) / dt) + 16
+    time_log = np.empty(n_max)
+    x_log = np.empty(n_max)
+    y_log = np.empty(n_max)
+    yaw_log = np.empty(n_max)
+    height_log = np.empty(n_max, dtype=np.float32)
+    n_log = 0
     sim_time = 0.0
     fallen = False
 
     def step_loop(dur, label):
-        nonlocal sim_time, fallen
+        nonlocal sim_time, fallen, n_log
         t0 = sim_time
         while sim_time - t0 < dur and not fallen:
-            base = env.get_base_state()
-            h = base['position'][2]
-            roll, pitch, yaw = base['orientation_euler']
+            bx, by, h, roll, pitch, yaw = env.get_base_state_into(pose).tolist()
             
             gj = gait.update(dt)
             rc, pc = pid.update(roll, pitch, dt)
             corr = pid.compute_joint_corrections(rc, pc)
-            final = {k: gj.get(k, 0) + np.clip(corr.get(k, 0), -2, 2) for k in gj}
+            fuse_targets(targets, joint_order, gj, corr)
             
-            env.set_joint_positions(final)
-            for _ in range(steps_per_ctrl):
-                env.step()
+            env.set_joint_positions_array(targets)
+            env.run_steps(steps_per_ctrl)
             sim_time += dt
 
-            time_log.append(sim_time)
-            x_log.append(base['position'][0])
-            y_log.append(base['position'][1])
-            yaw_log.append(yaw)
-            height_log.append(h)
-            phase_labels.append(label)
+            time_log[n_log] = sim_time
+            x_log[n_log] = bx
+            y_log[n_log] = by
+            yaw_log[n_log] = yaw
+            height_log[n_log] = h
+            n_log += 1
 
-            if h < 0.10:
+            if h < FALL_HEIGHT:
                 print(f"   ⚠️  跌倒 (t={sim_time:.1f}s, h={h:.3f}m)")
                 fallen = True
                 return
         
-        base = env.get_base_state()
-        r, p, y = base['orientation_euler']
+        bx, by, h, _, _, yaw = env.get_base_state_into(pose).tolist()
         print(f"   [{label:12s}] t={sim_time:5.1f}s  "
-              f"x={base['position'][0]:+.3f}m  y={base['position'][1]:+.3f}m  "
-              f"yaw={y:+.1f}°  h={base['position'][2]:.4f}m")
+              f"x={bx:+.3f}m  y={by:+.3f}m  "
+              f"yaw={yaw:+.1f}°  h={h:.4f}m")
 
     print(f"\n[2/2] 执行测试序列...")
 
     # 1. 原地站立
-    stand = {k: 0.0 for k in [
-        'head_pitch', 'left_hip_roll', 'left_hip_pitch', 'left_knee',
-        'left_ankle_pitch', 'right_hip_roll', 'right_hip_pitch',
-        'right_knee', 'right_ankle_pitch'
-    ]}
-    for _ in range(200):
-        env.set_joint_positions(stand)
-        for _ in range(steps_per_ctrl):
-            env.step()
+    targets.fill(0.0)  # 直腿零位
+    env.set_joint_positions_array(targets)  # 目标保持不变，发送一次即可
+    env.run_steps(200 * steps_per_ctrl)
     sim_time = 2.0
     print(f"   [{'预热':12s}] t={sim_time:5.1f}s  站立稳定")
 
@@ -128,23 +154,26 @@ def test_turning(gui: bool = True):
     # 评估
     print(f"\n{'='*60}")
     
-    if not time_log:
+    if not n_log:
         print("❌ 无数据")
         env.close()
         return
 
-    yaw_arr = np.array(yaw_log)
-    h_arr = np.array(height_log)
+    t_arr = time_log[:n_log]
+    x_arr = x_log[:n_log]
+    y_arr = y_log[:n_log]
+    yaw_arr = yaw_log[:n_log]
+    h_arr = height_log[:n_log]
     
     # 计算yaw变化
     init_yaw = yaw_arr[0]
     total_yaw = yaw_arr[-1] - init_yaw
     
     # 计算位移
-    total_x = abs(x_log[-1] - x_log[0])
-    total_y = abs(y_log[-1] - y_log[0])
+    total_x = abs(x_arr[-1] - x_arr[0])
+    total_y = abs(y_arr[-1] - y_arr[0])
     
-    print(f"\n  总时长: {time_log[-1]:.1f}s")
+    print(f"\n  总时长: {t_arr[-1]:.1f}s")
     print(f"  跌倒:  {'是 ❌' if fallen else '否 ✅'}")
     print(f"  总yaw变化: {total_yaw:.1f}°")
     print(f"  位移: x={total_x:.3f}m  y={total_y:.3f}m")
@@ -162,37 +191,16 @@ def test_turning(gui: bool = True):
         print(f"  ║   🎉 M4 里程碑达成！                 ║")
     print(f"  ╚══════════════════════════════════════╝")
 
-    # 图表
-    try:
-        import matplotlib
-        matplotlib.use('Agg')
-        import matplotlib.pyplot as plt
-        fig, axes = plt.subplots(3, 1, figsize=(12, 8), sharex=True)
-        axes[0].plot(time_log, [abs(x - x_log[0]) for x in x_log], 'b-', lw=0.8, label='|dx|')
-        axes[0].plot(time_log, [abs(y - y_log[0]) for y in y_log], 'r-', lw=0.8, label='|dy|')
-        axes[0].set_ylabel('Displacement (m)')
-        axes[0].legend()
-        axes[0].grid(True, alpha=0.3)
-        axes[0].set_title('Turning & Stopping Test')
-        axes[1].plot(time_log, [y - yaw_arr[0] for y in yaw_log], 'g-', lw=0.8)
-        axes[1].set_ylabel('Yaw Change (deg)')
-        axes[1].grid(True, alpha=0.3)
-        axes[2].plot(time_log, height_log, 'm-', lw=0.8)
-        axes[2].set_ylabel('Height (m)')
-        axes[2].set_xlabel('Time (s)')
-        axes[2].grid(True, alpha=0.3)
-        plt.tight_layout()
-        out = base_path / 'results'
-        out.mkdir(exist_ok=True)
-        path = out / 'turning_test.png'
-        plt.savefig(path, dpi=150)
-        plt.close()
-        print(f"\n  📊 结果图: {path}")
-    except Exception as e:
-        print(f"\n  ⚠️  图表失败: {e}")
-
     env.close()
 
+    # 图表交给子进程渲染，主流程不等 matplotlib 导入和保存；
+    # 子进程不是守护进程，解释器退出前会等它写完文件
+    # 日志按控制频率(100Hz)全速记录供上面统计用，绘图只取每5拍一点(20Hz)
+    s = slice(None, None, 5)
+    Process(target=_render_plot, args=(
+        RESULTS_DIR / 'turning_test.png', t_arr[s],
+        np.abs(x_arr[s] - x_arr[0]), np.abs(y_arr[s] - y_arr[0]), yaw_arr[s] - init_yaw, h_arr[s])).start()
+
 
 if __name__ == '__main__':
     ap = argparse.ArgumentParser()
@@ -9,27 +9,53 @@ import time
 import argparse
 import numpy as np
 from pathlib import Path
+from multiprocessing import Process
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.simulation.environment import SimulationEnvironment
+from _setup import make_env, fuse_targets, RESULTS_DIR, FALL_HEIGHT
 from src.control.gait_generator import GaitGenerator, GaitParams
 from src.control.posture_controller import PostureController, PIDGains
 
 
+def _render_plot(path, t_arr, dist_arr, h_arr, r_arr, p_arr, title):
+    """绘制并保存行走结果图（在子进程中运行）"""
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        fig, axes = plt.subplots(4, 1, figsize=(12, 10), sharex=True)
+        axes[0].plot(t_arr, dist_arr, 'b-', lw=0.8)
+        axes[0].axhline(1.0, color='r', ls='--', alpha=0.5, label='Target 1m')
+        axes[0].set_ylabel('Distance (m)')
+        axes[0].legend()
+        axes[0].grid(True, alpha=0.3)
+        axes[0].set_title(title)
+        axes[1].plot(t_arr, h_arr, 'g-', lw=0.8)
+        axes[1].set_ylabel('Height (m)')
+        axes[1].grid(True, alpha=0.3)
+        axes[2].plot(t_arr, r_arr, 'c-', lw=0.8, label='Roll')
+        axes[2].plot(t_arr, p_arr, 'm-', lw=0.8, label='Pitch')
+        axes[2].set_ylabel('Angle (deg)')
+        axes[2].legend()
+        axes[2].grid(True, alpha=0.3)
+        axes[3].set_xlabel('Time (s)')
+        plt.tight_layout()
+        path.parent.mkdir(exist_ok=True)
+        plt.savefig(path, dpi=150)
+        plt.close()
+        print(f"\n  📊 结果图: {path}")
+    except Exception as e:
+        print(f"\n  ⚠️  图表失败: {e}")
+
+
 def test_walking(duration: float = 60.0, gui: bool = True):
     print("=" * 60)
     print("  第二阶段 M3: 直线行走测试")
     print("=" * 60)
 
-    base_path = Path(__file__).parent.parent
-    config_path = base_path / 'config' / 'robot_config.yaml'
-    urdf_path   = base_path / 'models' / 'humanoid_v1.urdf'
-
     print("\n[1/4] 初始化仿真环境...")
-    env = SimulationEnvironment(str(config_path), gui=gui)
-    env.setup_world()
-    env.load_robot(str(urdf_path))
+    env = make_env(gui)
 
     print("\n[2/4] 初始化控制器...")
     gait = GaitGenerator(GaitParams(
@@ -58,15 +84,11 @@ def test_walking(duration: float = 60.0, gui: bool = True):
     steps_per_ctrl = int(dt / sim_dt)
     
     print("\n   预热: 稳定站立2秒...")
-    stand_pose = {k: 0.0 for k in [
-        'head_pitch', 'left_hip_roll', 'left_hip_pitch', 'left_knee',
-        'left_ankle_pitch', 'right_hip_roll', 'right_hip_pitch',
-        'right_knee', 'right_ankle_pitch'
-    ]}
-    for _ in range(200):
-        env.set_joint_positions(stand_pose)
-        for _ in range(steps_per_ctrl):
-            env.step()
+    # 关节目标按 env.joint_names 顺序写入同一个数组，逐拍复用
+    joint_order = env.joint_names
+    targets = np.zeros(len(joint_order))  # 直腿零位
+    env.set_joint_positions_array(targets)  # 目标保持不变，发送一次即可
+    env.run_steps(200 * steps_per_ctrl)
 
     # 记录初始位置
     init_base = env.get_base_state()
@@ -75,46 +97,48 @@ def test_walking(duration: float = 60.0, gui: bool = True):
 
     print(f"\n[3/4] 开始行走 (目标: 1米)...")
     
-    time_log, x_log, height_log, roll_log, pitch_log = [], [], [], [], []
+    # 日志预分配，按下标写入；x 用于首尾差保留 float64
+    n_max = int(duration / dt) + 16
+    time_log = np.empty(n_max)
+    x_log = np.empty(n_max)
+    height_log = np.empty(n_max, dtype=np.float32)
+    roll_log = np.empty(n_max, dtype=np.float32)
+    pitch_log = np.empty(n_max, dtype=np.float32)
+    i = 0
     fallen = False
     sim_time = 0.0
+    pose = np.empty(6)  # [x, y, z, roll, pitch, yaw]
 
     try:
         while sim_time < duration:
-            base = env.get_base_state()
-            h = base['position'][2]
-            x = base['position'][0]
-            roll, pitch, yaw = base['orientation_euler']
+            x, _, h, roll, pitch, yaw = env.get_base_state_into(pose).tolist()
 
             gait_joints = gait.update(dt)
             
             rc, pc = posture_pid.update(roll, pitch, dt)
             pid_corr = posture_pid.compute_joint_corrections(rc, pc)
 
-            final = {}
-            for jname, gval in gait_joints.items():
-                corr = np.clip(pid_corr.get(jname, 0.0), -2.0, 2.0)
-                final[jname] = gval + corr
+            fuse_targets(targets, joint_order, gait_joints, pid_corr)
 
-            env.set_joint_positions(final)
-            for _ in range(steps_per_ctrl):
-                env.step()
+            env.set_joint_positions_array(targets)
+            env.run_steps(steps_per_ctrl)
 
             sim_time += dt
 
-            time_log.append(sim_time)
-            x_log.append(x)
-            height_log.append(h)
-            roll_log.append(roll)
-            pitch_log.append(pitch)
+            time_log[i] = sim_time
+            x_log[i] = x
+            height_log[i] = h
+            roll_log[i] = roll
+            pitch_log[i] = pitch
+            i += 1
 
             dist = abs(x - init_x)
-            if len(time_log) % 100 == 0:
+            if i % 100 == 0:
                 print(f"   t={sim_time:5.1f}s  dist={dist:.3f}m  h={h:.4f}m  "
                       f"roll={roll:+5.1f}°  pitch={pitch:+5.1f}°  "
                       f"[{gait.phase_name}]  steps={gait.step_count}")
 
-            if h < 0.10:
+            if h < FALL_HEIGHT:
                 print(f"\n   ⚠️  跌倒 (h={h:.3f}m)")
                 fallen = True
                 break
@@ -126,15 +150,16 @@ def test_walking(duration: float = 60.0, gui: bool = True):
     except KeyboardInterrupt:
         print("\n   ⏹️  用户中断")
 
-    actual_duration = time_log[-1] if time_log else 0.0
-    total_dist = abs(x_log[-1] - init_x) if x_log else 0.0
+    t_arr = time_log[:i]
+    x_arr = x_log[:i]
+    h_arr = height_log[:i]
+    r_arr = roll_log[:i]
+    p_arr = pitch_log[:i]
+    actual_duration = float(t_arr[-1]) if i else 0.0
+    total_dist = abs(float(x_arr[-1]) - init_x) if i else 0.0
 
     print(f"\n[4/4] 评估结果")
     print("=" * 60)
-    
-    h_arr = np.array(height_log)
-    r_arr = np.array(roll_log)
-    p_arr = np.array(pitch_log)
 
     print(f"\n  测试时长:  {actual_duration:.1f}s")
     print(f"  行走距离: {total_dist:.3f}m")
@@ -143,8 +168,9 @@ def test_walking(duration: float = 60.0, gui: bool = True):
     if actual_duration > 0:
         print(f"  平均速度: {total_dist/actual_duration*100:.1f}cm/s")
     print(f"  高度: 均值={np.mean(h_arr):.4f}m  std={np.std(h_arr):.4f}m")
-    print(f"  Roll:  max={np.max(np.abs(r_arr)):.2f}°")
-    print(f"  Pitch: max={np.max(np.abs(p_arr)):.2f}°")
+    # |roll|/|pitch| 峰值：max(最大值, -最小值)，不生成 abs 临时数组
+    print(f"  Roll:  max={max(r_arr.max(), -r_arr.min()):.2f}°")
+    print(f"  Pitch: max={max(p_arr.max(), -p_arr.min()):.2f}°")
 
     c1 = total_dist >= 1.0
     c2 = not fallen
@@ -159,39 +185,16 @@ def test_walking(duration: float = 60.0, gui: bool = True):
         print(f"  ║   🎉 M3 里程碑达成！                 ║")
     print(f"  ╚══════════════════════════════════════╝")
 
-    # 图表
-    try:
-        import matplotlib
-        matplotlib.use('Agg')
-        import matplotlib.pyplot as plt
-        fig, axes = plt.subplots(4, 1, figsize=(12, 10), sharex=True)
-        axes[0].plot(time_log, [xi - init_x for xi in x_log], 'b-', lw=0.8)
-        axes[0].axhline(1.0, color='r', ls='--', alpha=0.5, label='Target 1m')
-        axes[0].set_ylabel('Distance (m)')
-        axes[0].legend()
-        axes[0].grid(True, alpha=0.3)
-        axes[0].set_title(f'Walking Test ({total_dist:.2f}m in {actual_duration:.1f}s)')
-        axes[1].plot(time_log, height_log, 'g-', lw=0.8)
-        axes[1].set_ylabel('Height (m)')
-        axes[1].grid(True, alpha=0.3)
-        axes[2].plot(time_log, roll_log, 'c-', lw=0.8, label='Roll')
-        axes[2].plot(time_log, pitch_log, 'm-', lw=0.8, label='Pitch')
-        axes[2].set_ylabel('Angle (deg)')
-        axes[2].legend()
-        axes[2].grid(True, alpha=0.3)
-        axes[3].set_xlabel('Time (s)')
-        plt.tight_layout()
-        out = base_path / 'results'
-        out.mkdir(exist_ok=True)
-        path = out / 'walking_test.png'
-        plt.savefig(path, dpi=150)
-        plt.close()
-        print(f"\n  📊 结果图: {path}")
-    except Exception as e:
-        print(f"\n  ⚠️  图表失败: {e}")
-
     env.close()
 
+    # 图表交给子进程渲染，主流程不等 matplotlib 导入和保存；
+    # 子进程不是守护进程，解释器退出前会等它写完文件
+    # 日志按控制频率(100Hz)全速记录供上面统计用，绘图只取每5拍一点(20Hz)
+    s = slice(None, None, 5)
+    Process(target=_render_plot, args=(
+        RESULTS_DIR / 'walking_test.png', t_arr[s], x_arr[s] - init_x, h_arr[s], r_arr[s], p_arr[s],
+        f'Walking Test ({total_dist:.2f}m in {actual_duration:.1f}s)')).start()
+
 
 if __name__ == '__main__':
     ap = argparse.ArgumentParser()
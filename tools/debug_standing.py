@@ -5,15 +5,23 @@
 系统化地定位机器人无法站立的根本原因
 """
 
+import io
+import os
 import sys
+import math
 import time
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
 import pybullet as p
 import pybullet_data
-import numpy as np
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+# 标量角度换算用常数乘法（np.rad2deg/np.deg2rad 对标量要走一次ufunc分派）
+_DEG2RAD = math.pi / 180.0
+_RAD2DEG = 180.0 / math.pi
+
 
 def print_header(text):
     print(f"\n{'='*60}")
@@ -21,6 +29,24 @@ def print_header(text):
     print(f"{'='*60}\n")
 
 
+def _scan_joints(robot):
+    """一次性查询全部关节信息并解码名称
+    
+    Returns:
+        (getJointInfo 结果列表, 关节名列表, 子链接名列表)，按关节索引排列
+    """
+    infos = [p.getJointInfo(robot, i) for i in range(p.getNumJoints(robot))]
+    names = [info[1].decode('utf-8') for info in infos]
+    link_names = [info[12].decode('utf-8') for info in infos]
+    return infos, names, link_names
+
+
+def _revolute_joint_map(infos, names):
+    """关节名 → 索引（只含转动关节）"""
+    return {name: i for i, (info, name) in enumerate(zip(infos, names))
+            if info[2] == p.JOINT_REVOLUTE}
+
+
 def test1_kinematics_check():
     """测试1: 检查运动学链 - 确认脚底高度"""
     print_header("测试1: 运动学链检查")
@@ -36,19 +62,19 @@ def test1_kinematics_check():
     # 在不同高度测试
     robot = p.loadURDF(urdf_path, [0, 0, 0.25], [0, 0, 0, 1], useFixedBase=False)
     
-    # 打印所有关节信息
-    num_joints = p.getNumJoints(robot)
+    # 打印所有关节信息（关节信息只查询一次，后面各轮直接复用）
+    infos, names, link_names = _scan_joints(robot)
+    num_joints = len(infos)
     print(f"总关节数: {num_joints}")
     print()
     
     joint_map = {}
-    for i in range(num_joints):
-        info = p.getJointInfo(robot, i)
-        name = info[1].decode('utf-8')
+    for i, info in enumerate(infos):
+        name = names[i]
         joint_type = info[2]
         parent_idx = info[16]
-        parent_name = "base" if parent_idx == -1 else p.getJointInfo(robot, parent_idx)[1].decode('utf-8')
-        link_name = info[12].decode('utf-8')
+        parent_name = "base" if parent_idx == -1 else names[parent_idx]
+        link_name = link_names[i]
         
         type_str = {0: "REVOLUTE", 1: "PRISMATIC", 4: "FIXED"}
         print(f"  关节[{i}] {name}")
@@ -63,22 +89,18 @@ def test1_kinematics_check():
     
     # 检查各link在世界坐标系中的位置
     print(f"\n--- 零位姿态下各部件位置 ---")
-    for i in range(num_joints):
-        link_state = p.getLinkState(robot, i)
-        info = p.getJointInfo(robot, i)
-        link_name = info[12].decode('utf-8')
+    link_states = p.getLinkStates(robot, list(range(num_joints)))
+    for link_name, link_state in zip(link_names, link_states):
         pos = link_state[0]
         print(f"  {link_name:25s}  位置: x={pos[0]:.4f} y={pos[1]:.4f} z={pos[2]:.4f}")
     
     base_pos, base_orn = p.getBasePositionAndOrientation(robot)
     print(f"\n  base_link                    位置: x={base_pos[0]:.4f} y={base_pos[1]:.4f} z={base_pos[2]:.4f}")
     
-    # 获取AABB找到最低点
-    for i in range(num_joints):
-        aabb_min, aabb_max = p.getAABB(robot, i)
-        info = p.getJointInfo(robot, i)
-        link_name = info[12].decode('utf-8')
+    # 获取AABB找到最低点（只查询脚部link）
+    for i, link_name in enumerate(link_names):
         if 'foot' in link_name:
+            aabb_min, aabb_max = p.getAABB(robot, i)
             print(f"\n  {link_name} AABB:")
             print(f"    最低点 z = {aabb_min[2]:.4f} m")
             print(f"    最高点 z = {aabb_max[2]:.4f} m")
@@ -119,7 +141,7 @@ def test2_no_gravity_motor():
     
     pos2, orn2 = p.getBasePositionAndOrientation(robot)
     euler2 = p.getEulerFromQuaternion(orn2)
-    print(f"有重力+无控制 1秒后: z={pos2[2]:.4f}m roll={np.rad2deg(euler2[0]):.1f}° pitch={np.rad2deg(euler2[1]):.1f}°")
+    print(f"有重力+无控制 1秒后: z={pos2[2]:.4f}m roll={euler2[0] * _RAD2DEG:.1f}° pitch={euler2[1] * _RAD2DEG:.1f}°")
     print(f"  → 说明: 没有电机控制时，关节自由塌陷，机器人倒下")
     
     p.disconnect()
@@ -141,16 +163,19 @@ def test3_gravity_with_motor():
     robot = p.loadURDF(urdf_path, [0, 0, 0.25], [0, 0, 0, 1], useFixedBase=False)
     
     # 收集可动关节
-    joint_map = {}
-    num_joints = p.getNumJoints(robot)
-    for i in range(num_joints):
-        info = p.getJointInfo(robot, i)
-        name = info[1].decode('utf-8')
-        if info[2] == p.JOINT_REVOLUTE:
-            joint_map[name] = i
+    infos, names, link_names = _scan_joints(robot)
+    joint_map = _revolute_joint_map(infos, names)
     
     print(f"可动关节: {list(joint_map.keys())}")
     
+    # 方案D/E 每步重发的控制参数：预先建好列表，循环内一次调用下发全部关节
+    joint_indices = list(joint_map.values())
+    n_joints = len(joint_indices)
+    zero_targets = [0.0] * n_joints
+    pd_forces = [50.0] * n_joints
+    pd_pgains = [0.5] * n_joints
+    pd_vgains = [0.1] * n_joints
+    
     # ===== 方案A: 所有关节角度=0, 直接施加位置控制 =====
     print(f"\n--- 方案A: 直腿站立 (全部角度=0) ---")
     
@@ -175,8 +200,8 @@ def test3_gravity_with_motor():
             pos, orn = p.getBasePositionAndOrientation(robot)
             euler = p.getEulerFromQuaternion(orn)
             print(f"  t={step/1000:.1f}s z={pos[2]:.4f}m "
-                  f"roll={np.rad2deg(euler[0]):.1f}° "
-                  f"pitch={np.rad2deg(euler[1]):.1f}°")
+                  f"roll={euler[0] * _RAD2DEG:.1f}° "
+                  f"pitch={euler[1] * _RAD2DEG:.1f}°")
     
     pos, orn = p.getBasePositionAndOrientation(robot)
     euler = p.getEulerFromQuaternion(orn)
@@ -204,8 +229,8 @@ def test3_gravity_with_motor():
             pos, orn = p.getBasePositionAndOrientation(robot)
             euler = p.getEulerFromQuaternion(orn)
             print(f"  t={step/1000:.1f}s z={pos[2]:.4f}m "
-                  f"roll={np.rad2deg(euler[0]):.1f}° "
-                  f"pitch={np.rad2deg(euler[1]):.1f}°")
+                  f"roll={euler[0] * _RAD2DEG:.1f}° "
+                  f"pitch={euler[1] * _RAD2DEG:.1f}°")
     
     pos, orn = p.getBasePositionAndOrientation(robot)
     euler = p.getEulerFromQuaternion(orn)
@@ -234,8 +259,8 @@ def test3_gravity_with_motor():
             pos, orn = p.getBasePositionAndOrientation(robot)
             euler = p.getEulerFromQuaternion(orn)
             print(f"  t={step/1000:.1f}s z={pos[2]:.4f}m "
-                  f"roll={np.rad2deg(euler[0]):.1f}° "
-                  f"pitch={np.rad2deg(euler[1]):.1f}°")
+                  f"roll={euler[0] * _RAD2DEG:.1f}° "
+                  f"pitch={euler[1] * _RAD2DEG:.1f}°")
     
     pos, orn = p.getBasePositionAndOrientation(robot)
     euler = p.getEulerFromQuaternion(orn)
@@ -261,24 +286,22 @@ def test3_gravity_with_motor():
         )
     
     for step in range(3000):
-        # 每步都重新发送控制命令
-        for name, idx in joint_map.items():
-            p.setJointMotorControl2(
-                robot, idx, p.POSITION_CONTROL,
-                targetPosition=0,
-                force=50,
-                positionGain=0.5,
-                velocityGain=0.1,
-                maxVelocity=2.0
-            )
+        # 每步都重新发送控制命令（maxVelocity 已由上面的逐关节设置保留在电机上）
+        p.setJointMotorControlArray(
+            robot, joint_indices, p.POSITION_CONTROL,
+            targetPositions=zero_targets,
+            forces=pd_forces,
+            positionGains=pd_pgains,
+            velocityGains=pd_vgains
+        )
         p.stepSimulation()
         
         if step % 1000 == 0:
             pos, orn = p.getBasePositionAndOrientation(robot)
             euler = p.getEulerFromQuaternion(orn)
             print(f"  t={step/1000:.1f}s z={pos[2]:.4f}m "
-                  f"roll={np.rad2deg(euler[0]):.1f}° "
-                  f"pitch={np.rad2deg(euler[1]):.1f}°")
+                  f"roll={euler[0] * _RAD2DEG:.1f}° "
+                  f"pitch={euler[1] * _RAD2DEG:.1f}°")
     
     pos, orn = p.getBasePositionAndOrientation(robot)
     euler = p.getEulerFromQuaternion(orn)
@@ -295,7 +318,7 @@ def test3_gravity_with_motor():
     
     # 给脚底增加摩擦力
     for name, idx in joint_map.items():
-        link_name = p.getJointInfo(robot, idx)[12].decode('utf-8')
+        link_name = link_names[idx]
         if 'foot' in link_name:
             p.changeDynamics(robot, idx, lateralFriction=2.0, spinningFriction=0.5, rollingFriction=0.01)
             print(f"  设置 {link_name} 高摩擦力")
@@ -311,23 +334,21 @@ def test3_gravity_with_motor():
         )
     
     for step in range(3000):
-        for name, idx in joint_map.items():
-            p.setJointMotorControl2(
-                robot, idx, p.POSITION_CONTROL,
-                targetPosition=0,
-                force=50,
-                positionGain=0.5,
-                velocityGain=0.1,
-                maxVelocity=2.0
-            )
+        p.setJointMotorControlArray(
+            robot, joint_indices, p.POSITION_CONTROL,
+            targetPositions=zero_targets,
+            forces=pd_forces,
+            positionGains=pd_pgains,
+            velocityGains=pd_vgains
+        )
         p.stepSimulation()
         
         if step % 1000 == 0:
             pos, orn = p.getBasePositionAndOrientation(robot)
             euler = p.getEulerFromQuaternion(orn)
             print(f"  t={step/1000:.1f}s z={pos[2]:.4f}m "
-                  f"roll={np.rad2deg(euler[0]):.1f}° "
-                  f"pitch={np.rad2deg(euler[1]):.1f}°")
+                  f"roll={euler[0] * _RAD2DEG:.1f}° "
+                  f"pitch={euler[1] * _RAD2DEG:.1f}°")
     
     pos, orn = p.getBasePositionAndOrientation(robot)
     euler = p.getEulerFromQuaternion(orn)
@@ -371,13 +392,8 @@ def test4_fixed_base_sanity():
     # 使用固定基座
     robot = p.loadURDF(urdf_path, [0, 0, 0.5], [0, 0, 0, 1], useFixedBase=True)
     
-    joint_map = {}
-    num_joints = p.getNumJoints(robot)
-    for i in range(num_joints):
-        info = p.getJointInfo(robot, i)
-        name = info[1].decode('utf-8')
-        if info[2] == p.JOINT_REVOLUTE:
-            joint_map[name] = i
+    infos, names, _ = _scan_joints(robot)
+    joint_map = _revolute_joint_map(infos, names)
     
     # 设置目标角度
     targets = {
@@ -388,7 +404,7 @@ def test4_fixed_base_sanity():
     
     for name, angle_deg in targets.items():
         idx = joint_map[name]
-        angle_rad = np.deg2rad(angle_deg)
+        angle_rad = angle_deg * _DEG2RAD
         p.resetJointState(robot, idx, angle_rad)
         p.setJointMotorControl2(
             robot, idx, p.POSITION_CONTROL,
@@ -398,18 +414,21 @@ def test4_fixed_base_sanity():
             velocityGain=0.1
         )
     
-    # 步进2秒
+    # 步进2秒：目标按关节顺序预先换算为弧度，每步一次调用下发
+    target_indices = [joint_map[name] for name in targets]
+    target_rads = [angle_deg * _DEG2RAD for angle_deg in targets.values()]
+    n_targets = len(target_indices)
+    forces = [50.0] * n_targets
+    pgains = [0.5] * n_targets
+    vgains = [0.1] * n_targets
     for step in range(2000):
-        for name, angle_deg in targets.items():
-            idx = joint_map[name]
-            angle_rad = np.deg2rad(angle_deg)
-            p.setJointMotorControl2(
-                robot, idx, p.POSITION_CONTROL,
-                targetPosition=angle_rad,
-                force=50,
-                positionGain=0.5,
-                velocityGain=0.1
-            )
+        p.setJointMotorControlArray(
+            robot, target_indices, p.POSITION_CONTROL,
+            targetPositions=target_rads,
+            forces=forces,
+            positionGains=pgains,
+            velocityGains=vgains
+        )
         p.stepSimulation()
     
     # 检查关节实际位置
@@ -417,7 +436,7 @@ def test4_fixed_base_sanity():
     for name, angle_deg in targets.items():
         idx = joint_map[name]
         state = p.getJointState(robot, idx)
-        actual = np.rad2deg(state[0])
+        actual = state[0] * _RAD2DEG
         print(f"  {name:25s}  目标={angle_deg:7.1f}°  实际={actual:7.1f}°  "
               f"误差={abs(actual-angle_deg):.2f}°  "
               f"{'✅' if abs(actual-angle_deg) < 1.0 else '❌'}")
@@ -425,11 +444,32 @@ def test4_fixed_base_sanity():
     p.disconnect()
 
 
+def _run_captured(test_fn) -> str:
+    """在子进程中运行一个诊断测试，返回它打印的全部内容"""
+    buf = io.StringIO()
+    with contextlib.redirect_stdout(buf):
+        test_fn()
+    return buf.getvalue()
+
+
 if __name__ == '__main__':
-    test1_kinematics_check()
-    test2_no_gravity_motor()
-    test3_gravity_with_motor()
-    test4_fixed_base_sanity()
+    tests = (
+        test1_kinematics_check,
+        test2_no_gravity_motor,
+        test3_gravity_with_motor,
+        test4_fixed_base_sanity,
+    )
+    
+    workers = min(len(tests), os.cpu_count() or 1)
+    if workers < 2 or '--serial' in sys.argv[1:]:
+        for test_fn in tests:
+            test_fn()
+    else:
+        # 各测试连接各自的 DIRECT 客户端、互不共享状态，分进程并行运行；
+        # 输出先在子进程中捕获，再按测试顺序打印，保持可读
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for text in pool.map(_run_captured, tests):
+                print(text, end='')
     
     print_header("诊断完成")
     print("根据以上测试结果，确定最佳方案并修改控制代码。")
@@ -6,17 +6,40 @@
 
 import sys
 import time
-import numpy as np
+import math
+import argparse
 from pathlib import Path
+from typing import Optional
 
 # 添加项目根目录到路径
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.simulation.environment import SimulationEnvironment
+import pybullet as p
 
+from src.simulation.environment import SimulationEnvironment, RatePacer
 
-def explore_standing_pose():
-    """使用GUI探索稳定的站立姿态"""
+_RAD2DEG = 180.0 / math.pi
+
+# 滑块每4帧读取一次（240Hz → 60Hz），已高于拖动滑块的实际更新频率
+_SLIDER_DIV = 4
+
+# 稳定判定：|roll|、|pitch| < 15°，直接在四元数上比较
+#   roll  = atan2(2(wx+yz), 1-2(x²+y²))，分母 = cos(roll)·cos(pitch)，
+#           |roll| < 15° ⇔ 分母 > 0 且 |分子| < tan15°·分母
+#   pitch = asin(2(wy-zx))，|pitch| < 15° ⇔ |2(wy-zx)| < sin15°
+_TILT_LIMIT = math.radians(15)
+_TAN_TILT = math.tan(_TILT_LIMIT)
+_SIN_TILT = math.sin(_TILT_LIMIT)
+
+
+def explore_standing_pose(profile_path: Optional[str] = None):
+    """使用GUI探索稳定的站立姿态
+    
+    Args:
+        profile_path: 若给出，用 PyBullet 内置性能记录把探索循环的耗时分布
+            写入JSON（PyBullet 按线程写成 <profile_path>_0.json，
+            在 Chrome 的 about://tracing 中打开查看）
+    """
     
     print("=" * 60)
     print("姿态探索工具")
@@ -47,102 +70,134 @@ def explore_standing_pose():
     # 添加调试滑块
     debug_params = env.add_debug_parameters()
     
+    # 滑块与关节的对应关系只建一次：按同一顺序缓存滑块ID和关节索引，
+    # 循环内直接以弧度批量下发，不再经过 名称->角度 字典和度/弧度往返换算
+    slider_names = list(debug_params)
+    slider_ids = list(debug_params.values())
+    slider_joint_ids = [env.joint_indices[n] for n in slider_names]
+    slider_forces = [10.0] * len(slider_ids)  # 与URDF effort一致
+    get_base_pose = p.getBasePositionAndOrientation
+    robot_id = env.robot_id
+    
+    # 控制帧率：按绝对截止时间节拍，不随每帧耗时漂移
+    pacer = RatePacer(240)
+    
     # 记录最佳姿态
-    best_pose = None
+    best_angles = None  # 最佳姿态的滑块值（弧度），退出后再换算成字典
     max_duration = 0
     stable_start_time = None
+    next_report_t = None  # 下一次打印/记录最佳姿态的时刻
     last_height = None
+    angles_rad = []
+    tick = 0
+    
+    profile_log = None
+    if profile_path:
+        profile_log = p.startStateLogging(p.STATE_LOGGING_PROFILE_TIMINGS, str(profile_path))
+        print(f"⏱️  性能记录: {profile_path}_0.json")
     
     try:
-        while True:
-            # 读取滑块值
-            joint_values = env.read_debug_parameters(debug_params)
-            
-            if not joint_values:  # 如果GUI被关闭
-                break
-            
-            # 转换为位置控制命令
-            joint_positions = {}
-            for joint_name, angle_rad in joint_values.items():
-                joint_positions[joint_name] = np.rad2deg(angle_rad)
-            
-            # 应用关节位置
-            env.set_joint_positions(joint_positions)
+        while slider_ids:  # 非GUI模式没有滑块，直接结束
+            # 读取滑块值（弧度）；位置控制目标在电机上持续有效，
+            # 其余帧沿用上次的值，滑块没动时也不必重新下发
+            if tick % _SLIDER_DIV == 0:
+                values = env.read_debug_parameter_values(slider_ids)
+                if not values:  # 如果GUI被关闭
+                    break
+                
+                if values != angles_rad:
+                    angles_rad = values
+                    # 一次调用下发所有关节目标（maxVelocity 已在加载时设置到电机上）
+                    p.setJointMotorControlArray(
+                        robot_id,
+                        slider_joint_ids,
+                        p.POSITION_CONTROL,
+                        targetPositions=angles_rad,
+                        forces=slider_forces
+                    )
+            tick += 1
             
             # 执行仿真步
             env.step()
             
-            # 获取当前状态
-            base_state = env.get_base_state()
-            current_height = base_state['position'][2]
-            current_roll, current_pitch, current_yaw = base_state['orientation_euler']
+            # 获取当前状态（欧拉角只在打印时换算）
+            pos, orn = get_base_pose(robot_id)
+            current_height = pos[2]
             
-            # 检查是否稳定
-            is_stable = (
-                current_height > 0.15 and
-                abs(current_roll) < 15 and
-                abs(current_pitch) < 15
-            )
+            # 检查是否稳定：先比较高度，倒地时不必再算姿态
+            is_stable = current_height > 0.15
+            if is_stable:
+                qx, qy, qz, qw = orn
+                roll_den = 1.0 - 2.0 * (qx * qx + qy * qy)
+                is_stable = (
+                    roll_den > 0.0 and
+                    abs(2.0 * (qw * qx + qy * qz)) < _TAN_TILT * roll_den and
+                    abs(2.0 * (qw * qy - qz * qx)) < _SIN_TILT
+                )
             
             if is_stable:
+                now = time.perf_counter()
                 if stable_start_time is None:
-                    stable_start_time = time.time()
+                    stable_start_time = now
+                    # 只在超过历史最长保持时间的下一个5秒整点打印
+                    next_report_t = stable_start_time + 5 * (max_duration // 5 + 1)
                     print(f"\n⏱️  开始计时... 高度={current_height:.3f}m")
                 
-                stable_duration = time.time() - stable_start_time
-                
-                # 每5秒显示一次
-                if int(stable_duration) % 5 == 0 and int(stable_duration) > max_duration:
-                    print(f"   保持稳定 {int(stable_duration)}秒 | "
+                # 每5秒显示一次，并更新最佳姿态
+                if now >= next_report_t:
+                    max_duration = int(now - stable_start_time)
+                    next_report_t = stable_start_time + 5 * (max_duration // 5 + 1)
+                    current_roll, current_pitch, _ = p.getEulerFromQuaternion(orn)
+                    current_roll *= _RAD2DEG
+                    current_pitch *= _RAD2DEG
+                    print(f"   保持稳定 {max_duration}秒 | "
                           f"高度={current_height:.3f}m | "
                           f"Roll={current_roll:.1f}° | "
                           f"Pitch={current_pitch:.1f}°")
-                    
-                    # 更新最佳姿态
-                    if stable_duration > max_duration:
-                        max_duration = int(stable_duration)
-                        best_pose = joint_positions.copy()
+                    # 每次读取滑块都会得到新列表，直接保留引用即可
+                    best_angles = angles_rad
                         
             else:
                 if stable_start_time is not None:
-                    duration = time.time() - stable_start_time
+                    duration = time.perf_counter() - stable_start_time
                     if duration > 3:  # 只记录超过3秒的稳定期
                         print(f"\n❌ 失去稳定 (保持了{duration:.1f}秒)")
                     stable_start_time = None
             
             # 控制帧率
-            time.sleep(1/240)
+            pacer.wait()
             
     except KeyboardInterrupt:
         print("\n\n⏹️  用户停止探索")
     except Exception as e:
         print(f"\n⚠️  程序异常: {e}")
+    finally:
+        if profile_log is not None and p.isConnected():
+            p.stopStateLogging(profile_log)
     
     # 显示结果
     print("\n" + "=" * 60)
     print("探索结果")
     print("=" * 60)
     
-    if best_pose and max_duration > 0:
+    if best_angles and max_duration > 0:
+        # 姿态字典文本只拼一次，打印和写文件共用
+        pose_text = "standing_pose = {\n" + "".join(
+            f"    '{name}': {a * _RAD2DEG:.1f},\n"
+            for name, a in zip(slider_names, best_angles)) + "}\n"
         print(f"\n🎯 找到稳定姿态！最长保持时间: {max_duration}秒")
         print("\n关节角度配置:")
         print("```python")
-        print("standing_pose = {")
-        for joint_name, angle in best_pose.items():
-            print(f"    '{joint_name}': {angle:.1f},")
-        print("}")
+        print(pose_text, end="")
         print("```")
         
-        # 保存到文件
+        # 保存到文件（一次写入）
         output_file = base_path / 'config' / 'standing_pose.txt'
         with open(output_file, 'w') as f:
-            f.write("# 稳定站立姿态配置\n")
-            f.write(f"# 测试时长: {max_duration}秒\n")
-            f.write(f"# 生成时间: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-            f.write("standing_pose = {\n")
-            for joint_name, angle in best_pose.items():
-                f.write(f"    '{joint_name}': {angle:.1f},\n")
-            f.write("}\n")
+            f.write("# 稳定站立姿态配置\n"
+                    f"# 测试时长: {max_duration}秒\n"
+                    f"# 生成时间: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+                    + pose_text)
         
         print(f"\n✅ 配置已保存到: {output_file}")
         
@@ -161,4 +216,8 @@ def explore_standing_pose():
 
 
 if __name__ == '__main__':
-    explore_standing_pose()
+    ap = argparse.ArgumentParser(description='姿态探索工具')
+    ap.add_argument('--profile', metavar='PATH', default=None,
+                    help='记录探索循环的性能数据，写入 PATH_0.json（about://tracing 查看）')
+    args = ap.parse_args()
+    explore_standing_pose(profile_path=args.profile)
@@ -7,6 +7,7 @@
 3. 基础数据结构
 """
 
+import re
 import sys
 from pathlib import Path
 import yaml
@@ -112,13 +113,12 @@ def test_urdf_generator():
             print(f"   - 路径: {urdf_path}")
             print(f"   - 大小: {file_size} 字节")
             
-            # 读取并检查内容
-            with open(urdf_path, 'r') as f:
-                content = f.read()
-                joint_count = content.count('<joint name=')
-                link_count = content.count('<link name=')
-                print(f"   - 链接数: {link_count}")
-                print(f"   - 关节数: {joint_count}")
+            # 读取并检查内容：按字节一次扫描同时统计 link 和 joint
+            counts = {b'joint': 0, b'link': 0}
+            for m in re.finditer(rb'<(joint|link) name=', urdf_path.read_bytes()):
+                counts[m.group(1)] += 1
+            print(f"   - 链接数: {counts[b'link']}")
+            print(f"   - 关节数: {counts[b'joint']}")
             
             return True
         else: